@@ -0,0 +1,177 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from models.database import Inventory, ForecastAccuracy, db
+from ai.forecasting import FORECAST_MODELS, build_demand_matrix, daily_matrix, forecast_demand
+from ai.history_archive import history
+
+DEFAULT_HORIZON_DAYS = 7
+DEFAULT_ORIGINS = 8
+MIN_TRAINING_DAYS = 14
+
+# Products per worker task; large enough to keep the pool busy on matrix work
+CHUNK_SIZE = 2000
+
+# MAPE thresholds used to turn backtest accuracy into a confidence label
+HIGH_CONFIDENCE_MAPE = 0.3
+MEDIUM_CONFIDENCE_MAPE = 0.6
+
+
+def origin_days(n_days, horizon, origins, min_training=MIN_TRAINING_DAYS):
+    """Forecast origins (day indexes) for rolling-origin evaluation, oldest first."""
+    last = n_days - horizon
+    return sorted(day for day in (last - i * horizon for i in range(origins)) if day >= min_training)
+
+
+def reconstruct_stock(demand, purchases, current_stock):
+    """
+    Estimate stock on hand at the start of every day by walking back from current
+    stock: stock[:, d] = current + sales from day d on - purchases from day d on.
+    Manual inventory edits are not part of the history, so this is an estimate.
+    """
+    net_after = np.cumsum((demand - purchases)[:, ::-1], axis=1)[:, ::-1]
+    return current_stock[:, None] + net_after
+
+
+def backtest_chunk(demand, purchases, current_stock, models, horizon, origins):
+    """
+    Rolling-origin evaluation of every model on a block of products.
+    Returns {model: (mae, mape, stockout_alerts, stockout_hits)} arrays per product.
+    """
+    stock = reconstruct_stock(demand, purchases, current_stock)
+    n_products = demand.shape[0]
+    results = {}
+
+    for model in models:
+        abs_error = np.zeros(n_products)
+        pct_error = np.zeros(n_products)
+        pct_count = np.zeros(n_products)
+        alerts = np.zeros(n_products, dtype=np.int64)
+        hits = np.zeros(n_products, dtype=np.int64)
+
+        for origin in origins:
+            forecast, _ = forecast_demand(demand[:, :origin], model)
+            actual = demand[:, origin:origin + horizon]
+            received = purchases[:, origin:origin + horizon]
+
+            abs_error += np.abs(actual - forecast[:, None]).mean(axis=1)
+
+            actual_total = actual.sum(axis=1)
+            has_actual = actual_total > 0
+            pct_error[has_actual] += (
+                np.abs(actual_total - forecast * horizon)[has_actual] / actual_total[has_actual]
+            )
+            pct_count += has_actual
+
+            # An alert is a forecast stockout inside the horizon; a hit is an
+            # alert where stock really ran out before the horizon ended
+            opening = stock[:, origin]
+            alert = (forecast > 0) & (opening < forecast * horizon)
+            closing = opening[:, None] - np.cumsum(actual - received, axis=1)
+            stocked_out = (closing <= 0).any(axis=1)
+            alerts += alert
+            hits += alert & stocked_out
+
+        mape = np.full(n_products, np.nan)
+        np.divide(pct_error, pct_count, out=mape, where=pct_count > 0)
+        results[model] = (abs_error / len(origins), mape, alerts, hits)
+
+    return results
+
+
+def _purchase_matrix(product_ids, start_date, n_days):
+    """Daily received quantities aligned with the demand matrix."""
+    end_date = start_date + timedelta(days=n_days - 1)
+    matrix, _ = daily_matrix(history('purchases', start_date, end_date), product_ids, start_date, n_days)
+    return matrix
+
+
+def run_backtest(models=FORECAST_MODELS, horizon=DEFAULT_HORIZON_DAYS, origins=DEFAULT_ORIGINS,
+                 workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Replay sales history with rolling-origin evaluation and store per product,
+    per model accuracy in the forecast_accuracy table.
+
+    The history is read once in the parent process; product blocks are spread
+    across a process pool (workers=1 runs everything in-process).
+    """
+    for model in models:
+        if model not in FORECAST_MODELS:
+            raise ValueError(f"Unknown forecast model '{model}'. Choose one of: {', '.join(FORECAST_MODELS)}")
+
+    product_ids, start_date, demand, _ = build_demand_matrix()
+    if not len(product_ids):
+        return {'success': False, 'error': 'No products to evaluate'}
+    n_days = demand.shape[1]
+    origin_list = origin_days(n_days, horizon, origins)
+    if not origin_list:
+        return {
+            'success': False,
+            'error': f'Not enough sales history: need at least {MIN_TRAINING_DAYS + horizon} days'
+        }
+
+    purchases = _purchase_matrix(product_ids, start_date, n_days)
+    stock_by_product = dict(db.session.query(Inventory.product_id, Inventory.stock_quantity).all())
+    current_stock = np.array([stock_by_product.get(pid, 0) for pid in product_ids.tolist()], dtype=np.float64)
+
+    blocks = [slice(i, i + chunk_size) for i in range(0, len(product_ids), chunk_size)]
+    args = [(demand[b], purchases[b], current_stock[b], tuple(models), horizon, origin_list) for b in blocks]
+
+    if workers == 1 or len(blocks) <= 1:
+        chunk_results = [backtest_chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk_results = list(pool.map(backtest_chunk, *zip(*args)))
+
+    evaluated_at = datetime.utcnow()
+    rows = []
+    summary = {}
+    for model in models:
+        mae, mape, alerts, hits = (
+            np.concatenate([r[model][field] for r in chunk_results]) for field in range(4)
+        )
+
+        for idx, product_id in enumerate(product_ids.tolist()):
+            rows.append({
+                'product_id': product_id,
+                'model': model,
+                'horizon_days': horizon,
+                'origins': len(origin_list),
+                'mae': float(mae[idx]),
+                'mape': None if np.isnan(mape[idx]) else float(mape[idx]),
+                'stockout_alerts': int(alerts[idx]),
+                'stockout_hits': int(hits[idx]),
+                'evaluated_at': evaluated_at
+            })
+
+        total_alerts = int(alerts.sum())
+        summary[model] = {
+            'mae': round(float(mae.mean()), 3),
+            'mape': round(float(np.nanmean(mape)), 3) if np.any(~np.isnan(mape)) else None,
+            'stockout_alerts': total_alerts,
+            'stockout_hit_rate': round(int(hits.sum()) / total_alerts, 3) if total_alerts else None
+        }
+
+    ForecastAccuracy.query.filter(ForecastAccuracy.model.in_(models)).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(db.insert(ForecastAccuracy), rows)
+    db.session.commit()
+
+    return {
+        'success': True,
+        'products': len(product_ids),
+        'horizon_days': horizon,
+        'origins': len(origin_list),
+        'models': summary
+    }
+
+
+def accuracy_confidence(mape):
+    """Confidence label from backtest MAPE, or None when there is nothing to judge by."""
+    if mape is None:
+        return None
+    if mape <= HIGH_CONFIDENCE_MAPE:
+        return 'High'
+    if mape <= MEDIUM_CONFIDENCE_MAPE:
+        return 'Medium'
+    return 'Low'
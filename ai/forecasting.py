@@ -0,0 +1,155 @@
+import numpy as np
+from datetime import datetime, timedelta
+from models.database import Product, Sale, db
+from ai.history_archive import history, select_days
+
+# Models that can be requested through predict_low_stock / /api/predict
+FORECAST_MODELS = ('linear', 'ses', 'croston', 'moving_average')
+
+# Longest sales history (in days) loaded into the demand matrix
+MAX_HISTORY_DAYS = 365
+
+
+def build_demand_matrix(end_date=None, history_days=MAX_HISTORY_DAYS, sales=None):
+    """
+    Build a dense products x days demand matrix from the sales table.
+
+    Sales are aggregated per product and day (closed periods come from the
+    columnar history archive, the rest from one SQL query), so days without
+    sales show up as zero demand instead of being skipped.
+    Returns (product_ids, start_date, demand, sale_counts) where demand[i, d]
+    is the quantity of product_ids[i] sold on start_date + d days and
+    sale_counts[i] is the number of sale rows in the window. sales is an
+    already loaded history('sales') covering at least the window, to use
+    instead of reading it again.
+    """
+    end_date = end_date or datetime.now().date()
+
+    product_ids = np.array(
+        [row[0] for row in db.session.query(Product.product_id).order_by(Product.product_id)],
+        dtype=np.int64
+    )
+
+    first_sale_date = db.session.query(db.func.min(Sale.sale_date)).scalar()
+    start_date = end_date - timedelta(days=history_days - 1)
+    if first_sale_date and first_sale_date > start_date:
+        start_date = first_sale_date
+    n_days = max((end_date - start_date).days + 1, 1)
+
+    columns = history('sales', start_date, end_date) if sales is None else select_days(sales, start_date, end_date)
+    demand, sale_counts = daily_matrix(columns, product_ids, start_date, n_days)
+
+    return product_ids, start_date, demand, sale_counts
+
+
+def daily_matrix(columns, product_ids, start_date, n_days):
+    """
+    Scatter (product_ids, days, quantities, counts) arrays, as returned by
+    ai.history_archive.history, into a products x days matrix.
+    Returns (matrix, counts) where counts holds the summed count column per product.
+    """
+    matrix = np.zeros((len(product_ids), n_days), dtype=np.float64)
+    counts = np.zeros(len(product_ids), dtype=np.int64)
+    row_products, row_days, quantities, row_counts = columns
+
+    if len(row_products) and len(product_ids):
+        row_idx = np.searchsorted(product_ids, row_products)
+        # Skip rows of products that no longer exist
+        known = product_ids[np.minimum(row_idx, len(product_ids) - 1)] == row_products
+        day_idx = row_days - np.datetime64(start_date, 'D').astype(np.int64)
+        np.add.at(matrix, (row_idx[known], day_idx[known]), quantities[known].astype(np.float64))
+        np.add.at(counts, row_idx[known], row_counts[known])
+
+    return matrix, counts
+
+
+def linear_trend(demand):
+    """
+    Least-squares linear trend fitted to every row of the demand matrix at once.
+    Returns (next_day_forecast, r_squared) arrays.
+    """
+    n_products, n_days = demand.shape
+    t = np.arange(n_days, dtype=np.float64)
+    t_centered = t - t.mean()
+    t_var = (t_centered ** 2).sum()
+
+    row_mean = demand.mean(axis=1)
+    centered = demand - row_mean[:, None]
+    slope = centered @ t_centered / t_var if t_var > 0 else np.zeros(n_products)
+    forecast = row_mean + slope * (n_days - t.mean())
+
+    fitted = row_mean[:, None] + slope[:, None] * t_centered[None, :]
+    ss_res = ((demand - fitted) ** 2).sum(axis=1)
+    ss_tot = (centered ** 2).sum(axis=1)
+    r_squared = np.zeros(n_products)
+    np.divide(ss_tot - ss_res, ss_tot, out=r_squared, where=ss_tot > 0)
+
+    return np.maximum(forecast, 0), r_squared
+
+
+def simple_exponential_smoothing(demand, alpha=0.3):
+    """
+    Simple exponential smoothing over the day axis, vectorized across products.
+    Returns the next-day forecast for every row.
+    """
+    if demand.shape[1] == 0:
+        return np.zeros(demand.shape[0])
+    level = demand[:, 0].copy()
+    for day in range(1, demand.shape[1]):
+        level += alpha * (demand[:, day] - level)
+    return level
+
+
+def croston(demand, alpha=0.1):
+    """
+    Croston's method for intermittent demand, vectorized across products.
+    Demand size and inter-demand interval are smoothed separately and only
+    updated on days with a sale; the forecast is size / interval.
+    """
+    n_products = demand.shape[0]
+    size = np.zeros(n_products)
+    interval = np.ones(n_products)
+    since_last = np.ones(n_products)
+    seen = np.zeros(n_products, dtype=bool)
+
+    for day in range(demand.shape[1]):
+        column = demand[:, day]
+        has_demand = column > 0
+        first = has_demand & ~seen
+        update = has_demand & seen
+
+        size[first] = column[first]
+        interval[first] = since_last[first]
+
+        size[update] += alpha * (column[update] - size[update])
+        interval[update] += alpha * (since_last[update] - interval[update])
+
+        seen |= has_demand
+        since_last[has_demand] = 1
+        since_last[~has_demand] += 1
+
+    return np.where(seen, size / interval, 0.0)
+
+
+def moving_average(demand, window=7):
+    """Mean daily demand over the trailing window, for every row."""
+    if demand.shape[1] == 0:
+        return np.zeros(demand.shape[0])
+    return demand[:, -window:].mean(axis=1)
+
+
+def forecast_demand(demand, model='linear', **params):
+    """
+    Forecast next-day demand for every row of the demand matrix.
+    Returns (forecast, model_score); model_score is only available for the
+    linear model and is None otherwise.
+    """
+    if model == 'linear':
+        return linear_trend(demand)
+    if model == 'ses':
+        return simple_exponential_smoothing(demand, **params), None
+    if model == 'croston':
+        return croston(demand, **params), None
+    if model == 'moving_average':
+        return moving_average(demand, **params), None
+    raise ValueError(f"Unknown forecast model '{model}'. Choose one of: {', '.join(FORECAST_MODELS)}")
@@ -0,0 +1,340 @@
+import json
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+from datetime import date, datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models.database import Product, Sale, Purchase, db
+from models.fragment_cache import cascaded_tables
+
+# Columnar archive of closed periods of sales and purchases.
+#
+# Each kind lives in <HISTORY_ARCHIVE_DIR>/<kind>/ as one row per product and
+# day, sorted by (product_id, day):
+#   product_id.npy, day.npy (days since 1970-01-01), quantity.npy, count.npy
+#   index_products.npy / index_offsets.npy - CSR-style index by product
+#   meta.json - {"closed_through": "YYYY-MM-DD", ...}
+# Arrays are opened with mmap_mode='r'. Reads locate each product's day range
+# through the index and slice it, so only the selected rows are touched, and a
+# read that is one contiguous range is returned as views without copying.
+# SQLite stays the system of record: rows are not deleted, and any write that
+# lands in an archived period marks the archive stale until it is recompacted.
+# So does deleting a product or supplier whose archived rows the database
+# removes through ON DELETE CASCADE, and any bulk write reaching the table.
+
+ARCHIVE_SOURCES = {
+    'sales': (Sale, Sale.sale_date, Sale.quantity_sold, Sale.sale_id),
+    'purchases': (Purchase, Purchase.purchase_date, Purchase.quantity_purchased, Purchase.purchase_id),
+}
+COLUMNS = ('product_id', 'day', 'quantity', 'count')
+STALE_MARKER = 'STALE'
+
+_views = {}
+
+
+def _epoch_day(value):
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def archive_dir():
+    if not has_app_context():
+        return None
+    return current_app.config.get('HISTORY_ARCHIVE_DIR')
+
+
+class ArchiveView:
+    """Read-only, memory-mapped view of one archived kind"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.closed_through = datetime.strptime(self.meta['closed_through'], '%Y-%m-%d').date()
+        for name in COLUMNS + ('index_products', 'index_offsets'):
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+
+
+def load_archive(kind):
+    """Current archive view for kind, or None when there is no usable archive"""
+    base = archive_dir()
+    if not base:
+        return None
+    path = os.path.join(base, kind)
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path) or os.path.exists(os.path.join(base, f'{kind}.{STALE_MARKER}')):
+        return None
+
+    mtime = os.stat(meta_path).st_mtime_ns
+    cached = _views.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    view = ArchiveView(path)
+    _views[path] = (mtime, view)
+    return view
+
+
+def _live_rows(kind, after=None, start_date=None, end_date=None):
+    """Per product and day totals from SQLite as (product_id, day, quantity, count) arrays"""
+    model, date_column, quantity_column, id_column = ARCHIVE_SOURCES[kind]
+    query = db.session.query(
+        model.product_id, date_column, db.func.sum(quantity_column), db.func.count(id_column)
+    )
+    if after is not None:
+        query = query.filter(date_column > after)
+    if start_date is not None:
+        query = query.filter(date_column >= start_date)
+    if end_date is not None:
+        query = query.filter(date_column <= end_date)
+    rows = query.group_by(model.product_id, date_column).all()
+
+    if not rows:
+        return (np.zeros(0, dtype=np.int64),) * 4
+    products, dates, quantities, counts = zip(*rows)
+    return (
+        np.array(products, dtype=np.int64),
+        np.array(dates, dtype='datetime64[D]').astype(np.int64),
+        np.array(quantities, dtype=np.int64),
+        np.array(counts, dtype=np.int64),
+    )
+
+
+def _search_days(days, lo, hi, value, side):
+    """
+    np.searchsorted(days[lo[i]:hi[i]], value, side) + lo[i] for every range at
+    once: a bisection over all ranges together, reading O(ranges * log rows) days.
+    """
+    lo, hi = lo.copy(), hi.copy()
+    while True:
+        active = lo < hi
+        if not active.any():
+            return lo
+        mid = (lo + hi) // 2
+        probe = np.asarray(days[np.where(active, mid, 0)])
+        right = active & ((probe < value) if side == 'left' else (probe <= value))
+        lo = np.where(right, mid + 1, lo)
+        hi = np.where(active & ~right, mid, hi)
+
+
+def _archived_ranges(view, start_date=None, end_date=None):
+    """(starts, ends) of the archive rows between the dates, one range per product, adjacent ranges merged"""
+    starts = np.asarray(view.index_offsets[:-1])
+    ends = np.asarray(view.index_offsets[1:])
+    # Days are sorted within each product's range
+    if start_date is not None:
+        starts = _search_days(view.day, starts, ends, _epoch_day(start_date), 'left')
+    if end_date is not None:
+        ends = _search_days(view.day, starts, ends, _epoch_day(end_date), 'right')
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+
+    if len(starts) == 0:
+        return starts, ends
+    breaks = np.flatnonzero(starts[1:] != ends[:-1]) + 1
+    return starts[np.r_[0, breaks]], ends[np.r_[breaks - 1, len(ends) - 1]]
+
+
+def _read_archive(view, start_date=None, end_date=None):
+    starts, ends = _archived_ranges(view, start_date, end_date)
+    columns = [getattr(view, name) for name in COLUMNS]
+    if len(starts) == 1:
+        return tuple(column[starts[0]:ends[0]] for column in columns)
+    # Several ranges: gather just their rows
+    lengths = ends - starts
+    rows = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+    return tuple(np.asarray(column[rows]) for column in columns)
+
+
+def history(kind='sales', start_date=None, end_date=None):
+    """
+    Per product and day totals between start_date and end_date (inclusive) as
+    (product_ids, days, quantities, counts) arrays, days counted from 1970-01-01.
+    Closed periods are read from the memory-mapped archive; only the tail after
+    the archive's closed_through date is queried from SQLite. When the tail is
+    not needed and the rows are contiguous the arrays are read-only views.
+    """
+    view = load_archive(kind)
+    if view is None:
+        return _live_rows(kind, start_date=start_date, end_date=end_date)
+
+    archived = _read_archive(view, start_date, end_date)
+    if end_date is not None and end_date <= view.closed_through:
+        return archived
+    live = _live_rows(kind, after=view.closed_through, start_date=start_date, end_date=end_date)
+    return tuple(np.concatenate([a, l]) for a, l in zip(archived, live))
+
+
+def select_days(columns, start_date=None, end_date=None):
+    """Rows of history() columns between start_date and end_date (inclusive)"""
+    days = columns[1]
+    mask = np.ones(len(days), dtype=bool)
+    if start_date is not None:
+        mask &= days >= _epoch_day(start_date)
+    if end_date is not None:
+        mask &= days <= _epoch_day(end_date)
+    return tuple(column[mask] for column in columns)
+
+
+def _live_totals(kind, after=None):
+    """Total quantity per product from SQLite as (product_ids, totals) arrays"""
+    model, date_column, quantity_column, _ = ARCHIVE_SOURCES[kind]
+    query = db.session.query(model.product_id, db.func.sum(quantity_column))
+    if after is not None:
+        query = query.filter(date_column > after)
+    rows = query.group_by(model.product_id).all()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    products, totals = zip(*rows)
+    return np.array(products, dtype=np.int64), np.array(totals, dtype=np.int64)
+
+
+def product_totals(kind='sales'):
+    """
+    Total quantity per product over all history as (product_ids, totals).
+    Archived totals are summed per product range of the index; SQLite only
+    aggregates the tail after the archive.
+    """
+    view = load_archive(kind)
+    if view is None:
+        return _live_totals(kind)
+
+    archived_totals = np.zeros(0, dtype=np.int64)
+    if len(view.quantity):
+        archived_totals = np.add.reduceat(view.quantity, view.index_offsets[:-1])
+    live_products, live_totals = _live_totals(kind, after=view.closed_through)
+    products = np.concatenate([np.asarray(view.index_products), live_products])
+    quantities = np.concatenate([archived_totals, live_totals])
+
+    unique, inverse = np.unique(products, return_inverse=True)
+    return unique, np.bincount(inverse, weights=quantities, minlength=len(unique)).astype(np.int64)
+
+
+def default_closed_through(today=None):
+    """Last day of the previous calendar month"""
+    today = today or date.today()
+    return today.replace(day=1) - timedelta(days=1)
+
+
+def compact(kind, through):
+    """
+    Compact every day up to and including `through` into the archive for kind.
+    Appends to the existing archive, or rebuilds it from SQLite when it is
+    stale or does not exist yet. Returns the new archive metadata.
+    """
+    base = archive_dir()
+    path = os.path.join(base, kind)
+    stale_marker = os.path.join(base, f'{kind}.{STALE_MARKER}')
+    os.makedirs(base, exist_ok=True)
+
+    view = None
+    if os.path.exists(os.path.join(path, 'meta.json')) and not os.path.exists(stale_marker):
+        view = ArchiveView(path)
+        if through <= view.closed_through:
+            return view.meta
+
+    # Remember when the archive was marked stale; the marker is only cleared
+    # after the swap if no write touched it during the rebuild
+    stale_since = os.stat(stale_marker).st_mtime_ns if os.path.exists(stale_marker) else None
+
+    if view is None:
+        columns = _live_rows(kind, end_date=through)
+    else:
+        new = _live_rows(kind, after=view.closed_through, end_date=through)
+        columns = tuple(np.concatenate([np.asarray(getattr(view, name)), n]) for name, n in zip(COLUMNS, new))
+
+    order = np.lexsort((columns[1], columns[0]))
+    columns = tuple(c[order] for c in columns)
+    index_products, starts = np.unique(columns[0], return_index=True)
+    index_offsets = np.append(starts, len(columns[0])).astype(np.int64)
+
+    tmp_path = f'{path}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, values in zip(COLUMNS, columns):
+        np.save(os.path.join(tmp_path, f'{name}.npy'), values.astype(np.int64))
+    np.save(os.path.join(tmp_path, 'index_products.npy'), index_products.astype(np.int64))
+    np.save(os.path.join(tmp_path, 'index_offsets.npy'), index_offsets)
+    meta = {
+        'closed_through': through.strftime('%Y-%m-%d'),
+        'rows': int(len(columns[0])),
+        'products': int(len(index_products)),
+        'compacted_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # Open memory maps keep reading the old files after the swap
+    old_path = f'{path}.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    if stale_since is not None and os.stat(stale_marker).st_mtime_ns == stale_since:
+        os.remove(stale_marker)
+    return meta
+
+
+def _mark_stale(kind):
+    Path(archive_dir(), f'{kind}.{STALE_MARKER}').touch()
+
+
+def _mark_stale_if_archived(kind, target, date_attr):
+    view = load_archive(kind)
+    if view is None:
+        return
+    dates = [getattr(target, date_attr)] + list(inspect(target).attrs[date_attr].history.deleted or [])
+    for value in dates:
+        if value is not None and _epoch_day(value) <= _epoch_day(view.closed_through):
+            _mark_stale(kind)
+            return
+
+
+def _cascaded_kinds(table_name):
+    """Archived kinds whose rows a delete from table_name removes through ON DELETE CASCADE"""
+    tables = cascaded_tables(table_name) - {table_name}
+    return [kind for kind, source in ARCHIVE_SOURCES.items() if source[0].__tablename__ in tables]
+
+
+@event.listens_for(Sale, 'after_insert')
+@event.listens_for(Sale, 'after_update')
+@event.listens_for(Sale, 'after_delete')
+def _sale_changed(mapper, connection, target):
+    _mark_stale_if_archived('sales', target, 'sale_date')
+
+
+@event.listens_for(Purchase, 'after_insert')
+@event.listens_for(Purchase, 'after_update')
+@event.listens_for(Purchase, 'after_delete')
+def _purchase_changed(mapper, connection, target):
+    _mark_stale_if_archived('purchases', target, 'purchase_date')
+
+
+@event.listens_for(db.Model, 'after_delete', propagate=True)
+def _parent_deleted(mapper, connection, target):
+    # Children removed by the database (passive_deletes) get no events of their own
+    for kind in _cascaded_kinds(mapper.local_table.name):
+        view = load_archive(kind)
+        if view is None:
+            continue
+        if isinstance(target, Product):
+            i = np.searchsorted(view.index_products, target.product_id)
+            if i == len(view.index_products) or view.index_products[i] != target.product_id:
+                continue
+        _mark_stale(kind)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_write(orm_execute_state):
+    # db.insert/update/delete() skip the mapper events, and the rows they touch
+    # are not known here, so any bulk write reaching an archived table marks it stale
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        name = getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None)
+        if name is None:
+            return
+        tables = cascaded_tables(name) if orm_execute_state.is_delete else {name}
+        for kind, source in ARCHIVE_SOURCES.items():
+            if source[0].__tablename__ in tables and load_archive(kind) is not None:
+                _mark_stale(kind)
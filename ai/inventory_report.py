@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from models.database import Product, Inventory, Sale, Purchase, db
+from models.read_pool import read_only
+from models.fragment_cache import table_versions
+
+# Inventory KPIs for the whole catalog, computed from one read of products,
+# inventory, sales and purchases into DataFrames:
+#   turnover       units sold / average stock over the window
+#   days_of_cover  current stock / average daily units sold
+#   sell_through   units sold / (opening stock + units received)
+#   abc            A: products making the first 80% of revenue, B: the next 15%, C: the rest
+#   xyz            demand variability (coefficient of variation of weekly units):
+#                  X below 0.5, Y below 1.0, Z otherwise or no sales
+#   dead_stock     stock on hand and nothing sold in DEAD_STOCK_DAYS
+# Opening stock is reconstructed as current stock + units sold - units received.
+# Reports are cached per version of the tables they read (see fragment_cache),
+# for the REPORT_CACHE_SIZE most recently used windows.
+
+REPORT_TABLES = ('products', 'inventory', 'sales', 'purchases')
+DEFAULT_WINDOW_DAYS = 90
+MAX_WINDOW_DAYS = 730
+DEFAULT_REPORT_ROWS = 100
+MAX_REPORT_ROWS = 1000
+REPORT_CACHE_SIZE = 4  # Windows kept; each holds a DataFrame of the whole catalog
+DEAD_STOCK_DAYS = 90
+ABC_BREAKS = (0.80, 0.95)
+XYZ_BREAKS = (0.5, 1.0)
+REPORT_COLUMNS = [
+    'product_id', 'product_name', 'category', 'price', 'stock', 'units_sold', 'revenue', 'units_received',
+    'avg_daily_sales', 'days_of_cover', 'turnover', 'sell_through', 'abc', 'xyz', 'demand_cv',
+    'last_sale_date', 'dead_stock'
+]
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _frame(query, columns):
+    return pd.DataFrame(query.all(), columns=columns)
+
+
+@read_only()
+def build_report(window_days=DEFAULT_WINDOW_DAYS, today=None):
+    """One row per product with the KPIs above, highest revenue first"""
+    today = today or datetime.now().date()
+    start = today - timedelta(days=window_days - 1)
+    # Sales are read far enough back for dead stock detection too
+    sales_start = min(start, today - timedelta(days=DEAD_STOCK_DAYS - 1))
+
+    products = _frame(db.session.query(Product.product_id, Product.product_name, Product.category, Product.price),
+                      ['product_id', 'product_name', 'category', 'price']).set_index('product_id').sort_index()
+    stock = _frame(db.session.query(Inventory.product_id, Inventory.stock_quantity), ['product_id', 'stock'])
+    sales = _frame(db.session.query(Sale.product_id, Sale.sale_date, Sale.quantity_sold)
+                   .filter(Sale.sale_date >= sales_start, Sale.sale_date <= today),
+                   ['product_id', 'day', 'quantity'])
+    purchases = _frame(db.session.query(Purchase.product_id, Purchase.quantity_purchased)
+                       .filter(Purchase.purchase_date >= start, Purchase.purchase_date <= today),
+                       ['product_id', 'quantity'])
+
+    ids = products.index
+    report = products.copy()
+    report['stock'] = stock.groupby('product_id')['stock'].sum().reindex(ids, fill_value=0)
+
+    sales['day'] = pd.to_datetime(sales['day'])
+    in_window = sales[sales['day'] >= pd.Timestamp(start)]
+    report['units_sold'] = in_window.groupby('product_id')['quantity'].sum().reindex(ids, fill_value=0)
+    report['units_received'] = purchases.groupby('product_id')['quantity'].sum().reindex(ids, fill_value=0)
+    report['revenue'] = (report['units_sold'] * report['price']).round(2)
+    last_sale = sales.groupby('product_id')['day'].max().reindex(ids)
+
+    # Weekly demand matrix (products x weeks) for variability
+    weeks = (window_days + 6) // 7
+    week = (in_window['day'] - pd.Timestamp(start)).dt.days // 7
+    weekly = in_window.groupby([in_window['product_id'], week])['quantity'].sum().unstack(fill_value=0) \
+        .reindex(index=ids, columns=range(weeks), fill_value=0)
+    weekly_mean = weekly.mean(axis=1)
+    cv = weekly.std(axis=1, ddof=0) / weekly_mean.where(weekly_mean > 0)
+
+    opening = (report['stock'] + report['units_sold'] - report['units_received']).clip(lower=0)
+    average_stock = (opening + report['stock']) / 2
+    daily = report['units_sold'] / window_days
+    report['avg_daily_sales'] = daily.round(3)
+    report['days_of_cover'] = (report['stock'] / daily.where(daily > 0)).round(1)
+    report['turnover'] = (report['units_sold'] / average_stock.where(average_stock > 0)).round(3)
+    available = opening + report['units_received']
+    report['sell_through'] = (report['units_sold'] / available.where(available > 0)).round(3)
+    report['demand_cv'] = cv.round(3)
+
+    # ABC on cumulative revenue share, largest first
+    report = report.sort_values(['revenue', 'units_sold'], ascending=False, kind='stable')
+    total_revenue = report['revenue'].sum()
+    share_before = (report['revenue'].cumsum() - report['revenue']) / total_revenue if total_revenue else 1.0
+    report['abc'] = np.where(report['revenue'] <= 0, 'C',
+                             np.where(share_before < ABC_BREAKS[0], 'A', np.where(share_before < ABC_BREAKS[1], 'B', 'C')))
+    report['xyz'] = np.select([report['demand_cv'] < XYZ_BREAKS[0], report['demand_cv'] < XYZ_BREAKS[1]], ['X', 'Y'], 'Z')
+
+    last_sale = last_sale.reindex(report.index)
+    dead_since = pd.Timestamp(today - timedelta(days=DEAD_STOCK_DAYS - 1))
+    report['dead_stock'] = (report['stock'] > 0) & (last_sale.isna() | (last_sale < dead_since))
+    report['last_sale_date'] = last_sale.dt.strftime('%Y-%m-%d')
+
+    return report.reset_index()[REPORT_COLUMNS]
+
+
+def inventory_report(window_days=DEFAULT_WINDOW_DAYS, ttl=60):
+    """
+    build_report() reused until one of REPORT_TABLES is written in this
+    process, the day changes or ttl seconds pass (writes in other processes).
+    """
+    key = (window_days, table_versions.get(REPORT_TABLES), datetime.now().date())
+    with _cache_lock:
+        cached = _cache.get(window_days)
+        if cached and cached[0] == key and monotonic() - cached[1] < ttl:
+            _cache.move_to_end(window_days)
+            return cached[2]
+    report = build_report(window_days, key[2])
+    with _cache_lock:
+        _cache[window_days] = (key, monotonic(), report)
+        _cache.move_to_end(window_days)
+        while len(_cache) > REPORT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return report
+
+
+def report_summary(report):
+    """Catalog-wide counts and totals for a report"""
+    dead = report[report['dead_stock']]
+    total_stock = report['stock'].sum()
+    return {
+        'products': int(len(report)),
+        'abc': {c: int(n) for c, n in report['abc'].value_counts().reindex(['A', 'B', 'C'], fill_value=0).items()},
+        'xyz': {c: int(n) for c, n in report['xyz'].value_counts().reindex(['X', 'Y', 'Z'], fill_value=0).items()},
+        'dead_stock_products': int(len(dead)),
+        'dead_stock_units': int(dead['stock'].sum()),
+        'dead_stock_value': round(float((dead['stock'] * dead['price']).sum()), 2),
+        'units_sold': int(report['units_sold'].sum()),
+        'revenue': round(float(report['revenue'].sum()), 2),
+        'stock_units': int(total_stock),
+        'stock_value': round(float((report['stock'] * report['price']).sum()), 2)
+    }
+
+
+def report_records(report):
+    """Report rows as JSON-ready dicts (missing values as None)"""
+    return report.astype(object).where(report.notna(), None).to_dict('records')
@@ -1,29 +1,43 @@
-import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
 from datetime import datetime, timedelta
-from models.database import Product, Sale, Inventory, db
+from models.database import Product, Inventory, ForecastAccuracy, db
+from models.read_pool import read_only
+from ai.forecasting import build_demand_matrix, forecast_demand
+from ai.backtest import accuracy_confidence
+from ai.history_archive import history, product_totals, select_days
 
-def predict_low_stock():
+SALES_TREND_DAYS = 30
+
+@read_only()
+def predict_low_stock(model='linear', sales=None):
     """
     Predicts which products will run out of stock soon based on historical sales data.
-    Uses Linear Regression to forecast next day sales.
+    Builds a daily demand matrix for the whole catalog and forecasts next day sales
+    for every product in one pass with the chosen model (see ai.forecasting).
+    Confidence comes from stored backtest accuracy when available (see ai.backtest),
+    otherwise from the number of sales records. sales is an already loaded
+    history('sales') covering the last MAX_HISTORY_DAYS, shared with the other insights panels.
     """
     try:
         predictions = []
         
-        # Get all products
-        products = Product.query.all()
+        product_ids, _, demand, sale_counts = build_demand_matrix(sales=sales)
+        forecast, model_score = forecast_demand(demand, model)
+        
+        products = {p.product_id: p for p in Product.query.all()}
+        stock_by_product = dict(
+            db.session.query(Inventory.product_id, Inventory.stock_quantity).all()
+        )
+        accuracy_by_product = {
+            a.product_id: a for a in ForecastAccuracy.query.filter_by(model=model).all()
+        }
         
-        for product in products:
-            # Get sales history for this product
-            sales = Sale.query.filter_by(product_id=product.product_id).order_by(Sale.sale_date).all()
+        for idx, product_id in enumerate(product_ids.tolist()):
+            product = products[product_id]
+            current_stock = stock_by_product.get(product_id, 0)
             
-            if not sales or len(sales) < 2:
+            if sale_counts[idx] < 2:
                 # Not enough data for prediction
-                inventory = Inventory.query.filter_by(product_id=product.product_id).first()
-                current_stock = inventory.stock_quantity if inventory else 0
-                
                 predictions.append({
                     'product_id': product.product_id,
                     'product_name': product.product_name,
@@ -36,35 +50,8 @@ def predict_low_stock():
                 })
                 continue
             
-            # Prepare data for regression
-            # Convert dates to numerical values (days since first sale)
-            first_sale_date = sales[0].sale_date
-            X = []
-            y = []
-            
-            for sale in sales:
-                days_diff = (sale.sale_date - first_sale_date).days
-                X.append([days_diff])
-                y.append(sale.quantity_sold)
-            
-            X = np.array(X)
-            y = np.array(y)
-            
-            # Train linear regression model
-            model = LinearRegression()
-            model.fit(X, y)
-            
-            # Predict sales for next day
-            last_sale_date = sales[-1].sale_date
-            days_since_first = (datetime.now().date() - first_sale_date).days
-            predicted_sales = model.predict([[days_since_first]])[0]
-            
             # Ensure prediction is not negative
-            predicted_sales = max(0, predicted_sales)
-            
-            # Get current stock
-            inventory = Inventory.query.filter_by(product_id=product.product_id).first()
-            current_stock = inventory.stock_quantity if inventory else 0
+            predicted_sales = max(0.0, float(forecast[idx]))
             
             # Calculate days until stockout
             if predicted_sales > 0:
@@ -82,15 +69,18 @@ def predict_low_stock():
             else:
                 status = '✅ Healthy Stock'
             
-            # Calculate confidence based on number of data points
-            if len(sales) >= 5:
-                confidence = 'High'
-            elif len(sales) >= 3:
-                confidence = 'Medium'
-            else:
-                confidence = 'Low'
+            # Prefer backtested accuracy; fall back to the number of data points
+            accuracy = accuracy_by_product.get(product_id)
+            confidence = accuracy_confidence(accuracy.mape) if accuracy else None
+            if confidence is None:
+                if sale_counts[idx] >= 5:
+                    confidence = 'High'
+                elif sale_counts[idx] >= 3:
+                    confidence = 'Medium'
+                else:
+                    confidence = 'Low'
             
-            predictions.append({
+            prediction = {
                 'product_id': product.product_id,
                 'product_name': product.product_name,
                 'category': product.category,
@@ -98,15 +88,20 @@ def predict_low_stock():
                 'predicted_sales': round(predicted_sales, 2),
                 'days_until_stockout': days_until_stockout if days_until_stockout < 999 else 'N/A',
                 'status': status,
-                'confidence': confidence,
-                'model_score': round(model.score(X, y), 2) if len(X) > 1 else 0
-            })
+                'confidence': confidence
+            }
+            if model_score is not None:
+                prediction['model_score'] = round(float(model_score[idx]), 2)
+            if accuracy:
+                prediction['accuracy'] = accuracy.to_dict()
+            predictions.append(prediction)
         
         # Sort by days until stockout (critical items first)
         predictions.sort(key=lambda x: x['days_until_stockout'] if isinstance(x['days_until_stockout'], int) else 999)
         
         return {
             'success': True,
+            'model': model,
             'predictions': predictions,
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
@@ -118,26 +113,25 @@ def predict_low_stock():
             'predictions': []
         }
 
-def get_sales_trend_data():
+@read_only()
+def get_sales_trend_data(sales=None):
     """
     Get sales trend data for visualization
     """
     try:
-        # Get sales for last 30 days
-        thirty_days_ago = datetime.now().date() - timedelta(days=30)
-        sales = Sale.query.filter(Sale.sale_date >= thirty_days_ago).order_by(Sale.sale_date).all()
+        # Get sales for last 30 days (archived days are read from the history archive)
+        start_date = datetime.now().date() - timedelta(days=SALES_TREND_DAYS)
+        if sales is None:
+            sales = history('sales', start_date=start_date)
+        _, days, quantities, _ = select_days(sales, start_date=start_date)
         
         # Aggregate by date
-        sales_by_date = {}
-        for sale in sales:
-            date_str = sale.sale_date.strftime('%Y-%m-%d')
-            if date_str not in sales_by_date:
-                sales_by_date[date_str] = 0
-            sales_by_date[date_str] += sale.quantity_sold
+        unique_days, inverse = np.unique(days, return_inverse=True)
+        totals = np.bincount(inverse, weights=quantities, minlength=len(unique_days))
         
         # Convert to lists for Chart.js
-        dates = sorted(sales_by_date.keys())
-        quantities = [sales_by_date[date] for date in dates]
+        dates = [str(day) for day in unique_days.astype('datetime64[D]')]
+        quantities = [int(total) for total in totals]
         
         return {
             'success': True,
@@ -151,21 +145,21 @@ def get_sales_trend_data():
             'error': str(e)
         }
 
+@read_only()
 def get_category_sales():
     """
-    Get sales distribution by category
+    Get sales distribution by category over all history (totals per product
+    come from the archive's product index, not a read of every row)
     """
     try:
-        products = Product.query.all()
+        product_ids, totals = product_totals('sales')
+        total_by_product = dict(zip(product_ids.tolist(), totals.tolist()))
         category_sales = {}
         
-        for product in products:
-            sales = Sale.query.filter_by(product_id=product.product_id).all()
-            total_sold = sum(sale.quantity_sold for sale in sales)
-            
-            if product.category not in category_sales:
-                category_sales[product.category] = 0
-            category_sales[product.category] += total_sold
+        for product_id, category in db.session.query(Product.product_id, Product.category).order_by(Product.product_id):
+            if category not in category_sales:
+                category_sales[category] = 0
+            category_sales[category] += total_by_product.get(product_id, 0)
         
         return {
             'success': True,
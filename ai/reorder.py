@@ -0,0 +1,222 @@
+import numpy as np
+from datetime import datetime, timedelta
+from models.database import (Product, Supplier, Inventory, Purchase, PurchaseOrder, PurchaseOrderLine, ReorderPoint,
+                             db)
+from models.read_pool import read_only
+from ai.forecasting import build_demand_matrix, forecast_demand
+
+# Reorder policy: order when the inventory position (stock + open orders)
+# falls to the reorder point, and order up to the demand expected over the
+# supplier's lead time plus one review period, plus safety stock.
+DEFAULT_LEAD_DAYS = 7.0
+DEFAULT_FILL_RATE = 1.0
+MIN_FILL_RATE = 0.25          # Floor so an unreliable supplier does not inflate orders without bound
+REVIEW_DAYS = 14
+SAFETY_Z = 1.65               # ~95% cycle service level
+VARIABILITY_WINDOW_DAYS = 56  # Recent days used for demand variability
+
+
+def _aligned(product_ids, rows, dtype=np.float64):
+    """Scatter (product_id, value) rows into an array aligned with product_ids"""
+    values = np.zeros(len(product_ids), dtype=dtype)
+    if rows:
+        ids, data = (np.array(column) for column in zip(*rows))
+        idx = np.searchsorted(product_ids, ids)
+        known = product_ids[np.minimum(idx, len(product_ids) - 1)] == ids
+        values[idx[known]] = data[known].astype(dtype)
+    return values
+
+
+def preferred_suppliers(product_ids):
+    """Supplier each product was last purchased from (0 when never purchased), aligned with product_ids"""
+    latest = db.session.query(
+        db.func.max(Purchase.purchase_id).label('purchase_id')
+    ).group_by(Purchase.product_id).subquery()
+    rows = db.session.query(Purchase.product_id, Purchase.supplier_id) \
+        .join(latest, Purchase.purchase_id == latest.c.purchase_id).all()
+    return _aligned(product_ids, rows, dtype=np.int64)
+
+
+def supplier_performance():
+    """
+    Lead time (days from order to receipt) and fill rate (units received per
+    unit ordered) per supplier, measured on received purchase order lines.
+    Returns {supplier_id: {'lead_days', 'fill_rate', 'lines_received'}}.
+    """
+    rows = db.session.query(
+        PurchaseOrder.supplier_id, PurchaseOrder.created_at, PurchaseOrderLine.received_at,
+        PurchaseOrderLine.quantity_ordered, PurchaseOrderLine.quantity_received
+    ).join(PurchaseOrderLine, PurchaseOrderLine.order_id == PurchaseOrder.order_id) \
+        .filter(PurchaseOrderLine.received_at.isnot(None)).all()
+    if not rows:
+        return {}
+
+    suppliers, ordered_at, received_at, ordered, received = zip(*rows)
+    suppliers, inverse = np.unique(np.array(suppliers, dtype=np.int64), return_inverse=True)
+    lead_days = np.array([(r - o).total_seconds() / 86400 for o, r in zip(ordered_at, received_at)])
+    lines = np.bincount(inverse)
+    lead = np.bincount(inverse, weights=lead_days) / lines
+    fill = np.bincount(inverse, weights=received) / np.maximum(np.bincount(inverse, weights=ordered), 1)
+
+    return {
+        int(supplier_id): {
+            'lead_days': round(float(lead[i]), 2),
+            'fill_rate': round(float(fill[i]), 3),
+            'lines_received': int(lines[i])
+        }
+        for i, supplier_id in enumerate(suppliers)
+    }
+
+
+def _reorder_plan(model, review_days, safety_z):
+    """Demand, stock position, supplier, reorder point and order quantity per product, as aligned arrays"""
+    product_ids, _, demand, _ = build_demand_matrix()
+    if not len(product_ids):
+        return None
+
+    forecast, _ = forecast_demand(demand, model)
+    daily_demand = np.maximum(forecast, 0.0)
+    sigma = demand[:, -VARIABILITY_WINDOW_DAYS:].std(axis=1)
+
+    stock = _aligned(product_ids, db.session.query(
+        Inventory.product_id, db.func.sum(Inventory.stock_quantity)
+    ).group_by(Inventory.product_id).all())
+    on_order = _aligned(product_ids, db.session.query(
+        PurchaseOrderLine.product_id,
+        db.func.sum(PurchaseOrderLine.quantity_ordered - PurchaseOrderLine.quantity_received)
+    ).join(PurchaseOrder, PurchaseOrder.order_id == PurchaseOrderLine.order_id)
+        .filter(PurchaseOrder.status == 'open', PurchaseOrderLine.received_at.is_(None))
+        .group_by(PurchaseOrderLine.product_id).all())
+
+    suppliers = preferred_suppliers(product_ids)
+    performance = supplier_performance()
+    lead = np.full(len(product_ids), DEFAULT_LEAD_DAYS)
+    fill = np.full(len(product_ids), DEFAULT_FILL_RATE)
+    for supplier_id, stats in performance.items():
+        mask = suppliers == supplier_id
+        lead[mask] = stats['lead_days']
+        fill[mask] = stats['fill_rate']
+
+    safety_stock = safety_z * sigma * np.sqrt(lead)
+    reorder_point = daily_demand * lead + safety_stock
+    order_up_to = daily_demand * (lead + review_days) + safety_stock
+    position = stock + on_order
+    # Order enough that what the supplier actually delivers reaches order_up_to
+    quantity = np.ceil((order_up_to - position) / np.maximum(fill, MIN_FILL_RATE))
+    needed = (daily_demand > 0) & (position <= reorder_point) & (quantity > 0)
+    return {
+        'product_ids': product_ids, 'daily_demand': daily_demand, 'stock': stock, 'on_order': on_order,
+        'suppliers': suppliers, 'lead': lead, 'fill': fill, 'reorder_point': reorder_point,
+        'quantity': quantity, 'needed': needed
+    }
+
+
+@read_only()
+def reorder_suggestions(model='linear', review_days=REVIEW_DAYS, safety_z=SAFETY_Z):
+    """
+    Reorder quantities for the whole catalog in one vectorized pass, grouped by
+    supplier into draft purchase orders. Products that need stock but have
+    never been purchased are returned under 'unassigned'. Nothing is written.
+    """
+    plan = _reorder_plan(model, review_days, safety_z)
+    if plan is None:
+        return {'orders': [], 'unassigned': []}
+    product_ids, daily_demand, stock, on_order = plan['product_ids'], plan['daily_demand'], plan['stock'], plan['on_order']
+    suppliers, lead, fill = plan['suppliers'], plan['lead'], plan['fill']
+    reorder_point, quantity = plan['reorder_point'], plan['quantity']
+
+    idx = np.flatnonzero(plan['needed'])
+    products = {
+        p.product_id: p for p in Product.query.filter(Product.product_id.in_(product_ids[idx].tolist()))
+    }
+    supplier_names = dict(db.session.query(Supplier.supplier_id, Supplier.supplier_name).all())
+    today = datetime.now().date()
+
+    orders = {}
+    unassigned = []
+    for i in idx.tolist():
+        product = products[int(product_ids[i])]
+        line = {
+            'product_id': product.product_id,
+            'product_name': product.product_name,
+            'quantity': int(quantity[i]),
+            'current_stock': int(stock[i]),
+            'on_order': int(on_order[i]),
+            'daily_demand': round(float(daily_demand[i]), 2),
+            'reorder_point': round(float(reorder_point[i]), 1),
+            'estimated_cost': round(product.price * int(quantity[i]), 2)
+        }
+        supplier_id = int(suppliers[i])
+        if supplier_id not in supplier_names:
+            unassigned.append(line)
+            continue
+        order = orders.setdefault(supplier_id, {
+            'supplier_id': supplier_id,
+            'supplier_name': supplier_names[supplier_id],
+            'lead_days': round(float(lead[i]), 2),
+            'fill_rate': round(float(fill[i]), 3),
+            'expected_date': (today + timedelta(days=int(np.ceil(lead[i])))).strftime('%Y-%m-%d'),
+            'lines': [],
+            'total_units': 0,
+            'estimated_cost': 0.0
+        })
+        order['lines'].append(line)
+        order['total_units'] += line['quantity']
+        order['estimated_cost'] = round(order['estimated_cost'] + line['estimated_cost'], 2)
+
+    return {'orders': [orders[s] for s in sorted(orders)], 'unassigned': unassigned}
+
+
+def update_reorder_points(model='linear', safety_z=SAFETY_Z):
+    """
+    Store the reorder point of every product with forecast demand, replacing
+    the previous run; products without demand go back to the default
+    threshold. The stock index of every process reloads them, so low-stock
+    listings use them. Returns the number of reorder points stored.
+    """
+    plan = _reorder_plan(model, REVIEW_DAYS, safety_z)
+    rows = []
+    if plan is not None:
+        now = datetime.utcnow()
+        with_demand = np.flatnonzero(plan['daily_demand'] > 0)
+        rows = [
+            {'product_id': int(plan['product_ids'][i]), 'reorder_point': round(float(plan['reorder_point'][i]), 3),
+             'model': model, 'updated_at': now}
+            for i in with_demand
+        ]
+    db.session.execute(db.delete(ReorderPoint))
+    if rows:
+        db.session.execute(db.insert(ReorderPoint), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def create_purchase_orders(drafts):
+    """
+    Insert accepted draft orders ({'supplier_id', 'expected_date', 'lines':
+    [{'product_id', 'quantity'}]}) as open purchase orders in one transaction.
+    Raises ValueError for unknown suppliers or products; nothing is written then.
+    """
+    supplier_ids = {int(d['supplier_id']) for d in drafts}
+    product_ids = {int(l['product_id']) for d in drafts for l in d['lines']}
+    known_suppliers = {s for (s,) in db.session.query(Supplier.supplier_id).filter(Supplier.supplier_id.in_(supplier_ids))}
+    known_products = {p for (p,) in db.session.query(Product.product_id).filter(Product.product_id.in_(product_ids))}
+    if supplier_ids - known_suppliers:
+        raise ValueError(f'Unknown suppliers: {sorted(supplier_ids - known_suppliers)}')
+    if product_ids - known_products:
+        raise ValueError(f'Unknown products: {sorted(product_ids - known_products)}')
+
+    orders = []
+    for draft in drafts:
+        lines = [
+            PurchaseOrderLine(product_id=int(l['product_id']), quantity_ordered=int(l['quantity']))
+            for l in draft['lines'] if int(l['quantity']) > 0
+        ]
+        if not lines:
+            continue
+        expected_date = datetime.strptime(draft['expected_date'], '%Y-%m-%d').date() if draft.get('expected_date') else None
+        orders.append(PurchaseOrder(supplier_id=int(draft['supplier_id']), expected_date=expected_date, lines=lines))
+
+    db.session.add_all(orders)
+    db.session.commit()
+    return orders
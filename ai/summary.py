@@ -0,0 +1,96 @@
+from models.database import Product, Sale, Purchase, Supplier, db
+from models.read_pool import read_only
+
+# Sales and purchase totals grouped by period or dimension, aggregated by
+# SQLite in one query. Revenue (sales) and value (purchases) are quantity times
+# the product's current price; no historical prices are stored.
+
+SUMMARY_SOURCES = {
+    'sales': (Sale, Sale.sale_date, Sale.quantity_sold, 'revenue'),
+    'purchases': (Purchase, Purchase.purchase_date, Purchase.quantity_purchased, 'value'),
+}
+PERIOD_GROUPS = ('day', 'week', 'month')
+GROUP_BY = {
+    'sales': PERIOD_GROUPS + ('product', 'category'),
+    'purchases': PERIOD_GROUPS + ('product', 'category', 'supplier'),
+}
+DEFAULT_SUMMARY_ROWS = 1000
+MAX_SUMMARY_ROWS = 10000
+
+
+def _group_columns(group_by, date_column):
+    """(column, output key) pairs the rows are grouped by"""
+    if group_by == 'day':
+        return [(db.func.strftime('%Y-%m-%d', date_column), 'period')]
+    if group_by == 'week':
+        # Monday of the week
+        return [(db.func.date(date_column, '-6 days', 'weekday 1'), 'period')]
+    if group_by == 'month':
+        return [(db.func.strftime('%Y-%m', date_column), 'period')]
+    if group_by == 'product':
+        return [(Product.product_id, 'product_id'), (Product.product_name, 'product_name')]
+    if group_by == 'category':
+        return [(Product.category, 'category')]
+    return [(Supplier.supplier_id, 'supplier_id'), (Supplier.supplier_name, 'supplier_name')]
+
+
+def check_summary(kind, group_by, supplier_id=None):
+    """Raise ValueError unless kind can be summarized by group_by (and filtered by supplier)"""
+    if kind not in SUMMARY_SOURCES:
+        raise ValueError(f"Unknown summary '{kind}'")
+    if group_by not in GROUP_BY[kind]:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY[kind])}")
+    if supplier_id is not None and kind != 'purchases':
+        raise ValueError('supplier_id only applies to purchases')
+
+
+@read_only()
+def summarize(kind, group_by, start_date=None, end_date=None, product_id=None, category=None, supplier_id=None,
+              limit=DEFAULT_SUMMARY_ROWS):
+    """
+    Quantity, revenue (or value) and transaction count per group_by bucket for
+    kind ('sales' or 'purchases'), optionally limited to a date range, product,
+    category or supplier (purchases only). Periods come back in date order,
+    other groups largest revenue first. At most limit rows are returned;
+    'truncated' says whether there were more. Raises ValueError for an
+    unsupported kind, group_by or supplier filter.
+    """
+    check_summary(kind, group_by, supplier_id)
+    limit = max(1, min(limit, MAX_SUMMARY_ROWS))
+
+    model, date_column, quantity_column, amount_name = SUMMARY_SOURCES[kind]
+    groups = _group_columns(group_by, date_column)
+    quantity = db.func.sum(quantity_column)
+    amount = db.func.sum(quantity_column * Product.price)
+
+    query = db.session.query(
+        *(column for column, _ in groups), quantity, amount, db.func.count()
+    ).select_from(model).join(Product, Product.product_id == model.product_id)
+    if group_by == 'supplier':
+        query = query.join(Supplier, Supplier.supplier_id == Purchase.supplier_id)
+    if start_date:
+        query = query.filter(date_column >= start_date)
+    if end_date:
+        query = query.filter(date_column <= end_date)
+    if product_id:
+        query = query.filter(model.product_id == product_id)
+    if category:
+        query = query.filter(Product.category == category)
+    if supplier_id:
+        query = query.filter(Purchase.supplier_id == supplier_id)
+
+    query = query.group_by(*(column for column, _ in groups))
+    if group_by in PERIOD_GROUPS:
+        query = query.order_by(groups[0][0])
+    else:
+        query = query.order_by(amount.desc(), groups[0][0])
+    rows = query.limit(limit + 1).all()
+
+    results = []
+    for row in rows[:limit]:
+        entry = {name: row[i] for i, (_, name) in enumerate(groups)}
+        entry['quantity'] = int(row[-3] or 0)
+        entry[amount_name] = round(float(row[-2] or 0), 2)
+        entry['transactions'] = int(row[-1])
+        results.append(entry)
+    return {'kind': kind, 'group_by': group_by, 'rows': results, 'truncated': len(rows) > limit}
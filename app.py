@@ -1,20 +1,65 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from datetime import datetime
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import os
 import sys
+import click
 
 # Add models directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'models'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'ai'))
 
-from models.database import db, Product, Supplier, Inventory, Sale, Purchase, User, ActivityLog, init_db
-from ai.predictor import predict_low_stock, get_sales_trend_data, get_category_sales
+from models.database import (db, Product, Supplier, Inventory, Sale, Purchase, User, ActivityLog, ForecastAccuracy, Location,
+                             PurchaseOrder, init_db)
+from models.user import user_cache
+from models.search import init_product_search, search_products, product_match_clause
+from models.stock_ledger import (init_stock_ledger, record_movement, stock_as_of, take_stock_snapshot,
+                                 reconcile_stock, ledger_start, end_of_day, MAX_AS_OF_ROWS)
+from models.locations import (shard_for, set_location_stock, record_location_sale, record_location_purchase,
+                              location_inventory, stock_across_locations, sales_across_locations,
+                              purge_location_rows, LOCATION_SCOPE_NOTE)
+from models.fragment_cache import fragment_cache, cached_fragment
+from models.stock_index import stock_index
+from models.read_pool import init_read_pool, pool_options, pool_stats
+from models.pagination import Page, DEFAULT_PER_PAGE
+from models.activity_log import activity_log_page, archived_log_page, archive_activity_logs, drop_archives
+from ai.predictor import predict_low_stock, get_sales_trend_data, get_category_sales, SALES_TREND_DAYS
+from ai.forecasting import FORECAST_MODELS, MAX_HISTORY_DAYS
+from ai.backtest import run_backtest, DEFAULT_HORIZON_DAYS, DEFAULT_ORIGINS
+from ai.reorder import reorder_suggestions, update_reorder_points, create_purchase_orders
+from ai.summary import summarize, check_summary, DEFAULT_SUMMARY_ROWS
+from ai.inventory_report import (inventory_report, report_summary, report_records, DEFAULT_WINDOW_DAYS,
+                                 MAX_WINDOW_DAYS, DEFAULT_REPORT_ROWS, MAX_REPORT_ROWS)
+from ai.history_archive import ARCHIVE_SOURCES, compact, default_closed_through, history
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///inventory.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///inventory.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'your-secret-key-here-change-in-production'
+app.config['USER_CACHE_SIZE'] = 1024  # Max cached user principals
+app.config['USER_CACHE_TTL'] = 300    # Seconds before a cached principal is reloaded
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = 16 * 1024 * 1024  # Rendered fragments kept in memory
+app.config['FRAGMENT_CACHE_TTL'] = 60  # Seconds; bounds staleness from writes in other processes
+app.config['ACTIVITY_LOG_RETENTION_DAYS'] = 90  # Days of activity kept in the database
+app.config['ACTIVITY_ARCHIVE_DIR'] = os.path.join(app.instance_path, 'activity_archive')
+app.config['HISTORY_ARCHIVE_DIR'] = os.path.join(app.instance_path, 'history_archive')
+app.config['LOCATION_SHARD_DIR'] = os.path.join(app.instance_path, 'location_shards')  # One SQLite file per location
+app.config['ASYNC_POOL_SIZE'] = 20      # asgi.py: async database connections
+app.config['ASYNC_POOL_TIMEOUT'] = 30   # asgi.py: seconds to wait for a free connection
+app.config['ASYNC_WSGI_WORKERS'] = 16   # asgi.py: threads serving the Flask routes
+app.config['STOCK_INDEX_CHECK_INTERVAL'] = 1.0  # Seconds between checks for other processes' inventory writes
+app.config['READ_POOL_ENABLED'] = True  # Send GET routes and analytics reads to a separate read-only pool
+app.config['READ_POOL_SIZE'] = max(os.cpu_count() or 1, 2)  # Concurrent reads; more than the CPUs starves writes
+app.config['READ_POOL_OVERFLOW'] = 0    # Extra reads wait up to POOL_TIMEOUT for a connection instead
+app.config['WRITE_POOL_SIZE'] = 5       # Connections for writes and reads inside write requests
+app.config['WRITE_POOL_OVERFLOW'] = 5
+app.config['POOL_TIMEOUT'] = 30         # Seconds to wait for a free connection in either pool
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pool_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config['WRITE_POOL_SIZE'],
+                                                       app.config['WRITE_POOL_OVERFLOW'], app.config['POOL_TIMEOUT'])
+
+BULK_DELETE_CHUNK = 500  # Ids per DELETE statement, well under SQLite's bound parameter limit
+MAX_PURCHASE_ORDERS = 500  # Most purchase orders returned by one GET /api/purchase-orders
 
 # Initialize Flask-Login
 login_manager = LoginManager()
@@ -22,12 +67,24 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Please log in to access this page.'
 
+user_cache.maxsize = app.config['USER_CACHE_SIZE']
+user_cache.ttl = app.config['USER_CACHE_TTL']
+fragment_cache.max_bytes = app.config['FRAGMENT_CACHE_MAX_BYTES']
+fragment_cache.ttl = app.config['FRAGMENT_CACHE_TTL']
+stock_index.check_interval = app.config['STOCK_INDEX_CHECK_INTERVAL']
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Served from a bounded TTL cache; entries are dropped when the user row changes
+    return user_cache.get(int(user_id))
 
 # Initialize database
 init_db(app)
+init_read_pool(app, db)
+with app.app_context():
+    init_product_search()
+    init_stock_ledger()
+    stock_index.load()
 
 # Helper function to log activities
 def log_activity(action_type, affected_table, affected_id=None, description=None):
@@ -43,6 +100,66 @@ def log_activity(action_type, affected_table, affected_id=None, description=None
         db.session.add(activity)
         db.session.commit()
 
+def cached_json_body(name, tables, compute, vary=None):
+    """JSON text of compute(), cached like a template fragment (see cached_fragment)"""
+    return cached_fragment(name, tables, lambda: app.json.response(compute()).get_data(as_text=True), vary=vary)
+
+def cached_json(name, tables, compute, vary=None):
+    """JSON response whose body is cached like a template fragment (see cached_fragment)"""
+    return app.response_class(cached_json_body(name, tables, compute, vary), mimetype='application/json')
+
+def bulk_delete(model, key, name_column, ids):
+    """
+    Delete the rows of model whose key is in ids with set-based DELETE
+    statements in one transaction; the database cascades to child rows.
+    Returns the names of the deleted rows by id. Commit is left to the caller.
+    """
+    deleted = {}
+    for start in range(0, len(ids), BULK_DELETE_CHUNK):
+        chunk = ids[start:start + BULK_DELETE_CHUNK]
+        found = dict(db.session.query(key, name_column).filter(key.in_(chunk)).all())
+        if found:
+            db.session.execute(db.delete(model).where(key.in_(list(found))), execution_options={'synchronize_session': False})
+        deleted.update(found)
+    return deleted
+
+def summary_response(kind, tables):
+    """JSON summary of kind from the group_by, date_from, date_to and filter query parameters"""
+    try:
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        params = {
+            'group_by': request.args.get('group_by', 'day'),
+            'start_date': datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None,
+            'end_date': datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None,
+            'product_id': request.args.get('product_id', type=int),
+            'category': request.args.get('category') or None,
+            'supplier_id': request.args.get('supplier_id', type=int),
+            'limit': request.args.get('limit', DEFAULT_SUMMARY_ROWS, type=int)
+        }
+        check_summary(kind, params['group_by'], params['supplier_id'])
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return cached_json(f'{kind}_summary', tables, lambda: {'success': True, **summarize(kind, **params)},
+                       vary=request.query_string)
+
+def list_params(sort_columns, default_sort, default_dir='asc'):
+    """Page cursor, page size and a whitelisted sort for list pages, read from the query string"""
+    sort = request.args.get('sort', default_sort)
+    if sort not in sort_columns:
+        sort = default_sort
+    direction = request.args.get('dir', default_dir)
+    if direction not in ('asc', 'desc'):
+        direction = default_dir
+    return {
+        'page': request.args.get('page', 1, type=int),
+        'after': request.args.get('after'),
+        'before': request.args.get('before'),
+        'per_page': request.args.get('per_page', DEFAULT_PER_PAGE, type=int),
+        'sort': sort,
+        'dir': direction
+    }
+
 # ============= AUTHENTICATION ROUTES =============
 @app.route('/')
 def home():
@@ -129,36 +246,45 @@ def logout():
 def dashboard():
     """Personalized dashboard for logged-in users"""
     try:
-        total_products = Product.query.count()
-        total_sales = db.session.query(db.func.sum(Sale.quantity_sold)).scalar() or 0
-        low_stock_count = Inventory.query.filter(Inventory.stock_quantity < 20).count()
-        total_suppliers = Supplier.query.count()
+        def banner():
+            # Get user stats
+            user_actions_count = ActivityLog.query.filter_by(user_id=current_user.user_id).count()
+            return render_template('fragments/dashboard_banner.html', user_actions_count=user_actions_count)
         
-        # Get recent sales
-        recent_sales = Sale.query.order_by(Sale.sale_date.desc()).limit(5).all()
+        def stats():
+            return render_template('fragments/dashboard_stats.html',
+                                   total_products=Product.query.count(),
+                                   total_sales=db.session.query(db.func.sum(Sale.quantity_sold)).scalar() or 0,
+                                   low_stock_count=len(stock_index.low_stock()),
+                                   total_suppliers=Supplier.query.count())
         
-        # Get low stock items
-        low_stock_items = db.session.query(Inventory, Product).join(
-            Product, Inventory.product_id == Product.product_id
-        ).filter(Inventory.stock_quantity < 20).limit(5).all()
+        def activity():
+            # Get user's recent activity
+            recent_activities = ActivityLog.query.filter_by(
+                user_id=current_user.user_id
+            ).order_by(ActivityLog.timestamp.desc()).limit(10).all()
+            return render_template('fragments/dashboard_activity.html', recent_activities=recent_activities)
         
-        # Get user's recent activity
-        recent_activities = ActivityLog.query.filter_by(
-            user_id=current_user.user_id
-        ).order_by(ActivityLog.timestamp.desc()).limit(10).all()
+        def recent_sales():
+            # Get recent sales
+            sales = Sale.query.options(db.joinedload(Sale.product)).order_by(Sale.sale_date.desc()).limit(5).all()
+            return render_template('fragments/dashboard_recent_sales.html', recent_sales=sales)
         
-        # Get user stats
-        user_actions_count = ActivityLog.query.filter_by(user_id=current_user.user_id).count()
+        def low_stock():
+            # Get low stock items, lowest stock first, from the in-memory stock index
+            low = stock_index.low_stock(limit=5)
+            products = {p.product_id: p for p in Product.query.filter(Product.product_id.in_([l[0] for l in low]))}
+            low_stock_items = [({'stock_quantity': stock}, products[product_id])
+                               for product_id, stock, _ in low if product_id in products]
+            return render_template('fragments/dashboard_low_stock.html', low_stock_items=low_stock_items)
         
+        # Each panel is cached until one of the tables it reads is written
         return render_template('dashboard.html',
-                             total_products=total_products,
-                             total_sales=total_sales,
-                             low_stock_count=low_stock_count,
-                             total_suppliers=total_suppliers,
-                             recent_sales=recent_sales,
-                             low_stock_items=low_stock_items,
-                             recent_activities=recent_activities,
-                             user_actions_count=user_actions_count)
+                             banner=cached_fragment('dashboard_banner', ('activity_logs', 'users'), banner, per_user=True),
+                             stats=cached_fragment('dashboard_stats', ('products', 'sales', 'inventory', 'suppliers', 'reorder_points'), stats),
+                             activity=cached_fragment('dashboard_activity', ('activity_logs',), activity, per_user=True),
+                             recent_sales=cached_fragment('dashboard_recent_sales', ('sales', 'products'), recent_sales),
+                             low_stock=cached_fragment('dashboard_low_stock', ('inventory', 'products', 'reorder_points'), low_stock))
     except Exception as e:
         return render_template('dashboard.html', error=str(e))
 
@@ -166,29 +292,82 @@ def dashboard():
 @app.route('/api/activity-log')
 @login_required
 def get_activity_log():
-    """Get current user's activity log"""
-    activities = ActivityLog.query.filter_by(
-        user_id=current_user.user_id
-    ).order_by(ActivityLog.timestamp.desc()).limit(50).all()
+    """Get current user's activity log (pass the last log_id as ?before= for the next page)"""
+    activities = activity_log_page(
+        user_id=current_user.user_id,
+        action_type=request.args.get('action'),
+        affected_table=request.args.get('table'),
+        before=request.args.get('before', type=int),
+        limit=request.args.get('limit', 50, type=int)
+    )
     return jsonify([a.to_dict() for a in activities])
 
 @app.route('/api/activity-log/all')
 @login_required
 def get_all_activity_logs():
-    """Get all users' activity logs (admin only)"""
+    """Get all users' activity logs (admin only), filterable by user, action and table"""
     if not current_user.is_admin:
         return jsonify({'success': False, 'error': 'Admin access required'}), 403
     
-    activities = ActivityLog.query.order_by(ActivityLog.timestamp.desc()).limit(100).all()
+    activities = activity_log_page(
+        user_id=request.args.get('user_id', type=int),
+        action_type=request.args.get('action'),
+        affected_table=request.args.get('table'),
+        before=request.args.get('before', type=int),
+        limit=request.args.get('limit', 100, type=int)
+    )
     return jsonify([a.to_dict() for a in activities])
 
+@app.route('/api/activity-log/archive/<month>')
+@login_required
+def get_archived_activity_logs(month):
+    """Browse an archived month (YYYY-MM), oldest first (admin only)"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+    try:
+        datetime.strptime(month, '%Y-%m')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Month must be in YYYY-MM format'}), 400
+    
+    rows = archived_log_page(
+        app.config['ACTIVITY_ARCHIVE_DIR'], month,
+        user_id=request.args.get('user_id', type=int),
+        action_type=request.args.get('action'),
+        affected_table=request.args.get('table'),
+        after=request.args.get('after', 0, type=int),
+        limit=request.args.get('limit', 100, type=int)
+    )
+    return jsonify(rows)
+
 # ============= PRODUCTS ROUTES =============
 @app.route('/products')
 @login_required
 def products():
-    """Products management page"""
-    products = Product.query.all()
-    return render_template('products.html', products=products)
+    """Products management page (paginated, sortable, filterable)"""
+    sort_columns = {
+        'id': Product.product_id,
+        'name': Product.product_name,
+        'category': Product.category,
+        'price': Product.price
+    }
+    params = list_params(sort_columns, 'id')
+    q = request.args.get('q', '').strip()
+    category = request.args.get('category', '').strip()
+    
+    query = Product.query
+    match = product_match_clause(q)
+    if match is not None:
+        query = query.filter(match)
+    if category:
+        query = query.filter(Product.category == category)
+    
+    def table():
+        page = Page(query, sort_columns[params['sort']], Product.product_id, params['dir'],
+                    params['after'], params['before'], params['per_page'], params['page'])
+        return render_template('fragments/products_table.html', products=page.items, page=page, params=params)
+    
+    table_html = cached_fragment('products_table', ('products',), table, vary=request.query_string)
+    return render_template('products.html', table=table_html, params=params, q=q, category=category)
 
 @app.route('/api/products', methods=['GET'])
 def get_products():
@@ -196,6 +375,16 @@ def get_products():
     products = Product.query.all()
     return jsonify([p.to_dict() for p in products])
 
+@app.route('/api/products/search', methods=['GET'])
+def search_products_api():
+    """Ranked prefix search over product name and category (API)"""
+    results = search_products(
+        request.args.get('q', ''),
+        limit=request.args.get('limit', 20, type=int),
+        category=request.args.get('category')
+    )
+    return jsonify(results)
+
 @app.route('/api/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     """Get single product (API)"""
@@ -223,6 +412,7 @@ def create_product():
             restock_date=datetime.now()
         )
         db.session.add(inventory)
+        record_movement(product.product_id, inventory.stock_quantity, inventory.stock_quantity, 'initial')
         db.session.commit()
         
         # Log activity
@@ -264,6 +454,7 @@ def delete_product(product_id):
         product_name = product.product_name
         db.session.delete(product)
         db.session.commit()
+        purge_location_rows(Location.query.all(), product_ids=[product_id])
         
         # Log activity
         log_activity('delete_product', 'products', product_id, f"Deleted product '{product_name}'")
@@ -273,6 +464,28 @@ def delete_product(product_id):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/products/bulk-delete', methods=['POST'])
+@login_required
+def bulk_delete_products():
+    """Delete many products, with their inventory, sales and purchases, in one transaction (API)"""
+    try:
+        product_ids = sorted({int(i) for i in (request.get_json() or {}).get('product_ids', [])})
+        if not product_ids:
+            return jsonify({'success': False, 'error': 'product_ids is required'}), 400
+        
+        deleted = bulk_delete(Product, Product.product_id, Product.product_name, product_ids)
+        db.session.commit()
+        purge_location_rows(Location.query.all(), product_ids=deleted)
+        if deleted:
+            log_activity('bulk_delete_products', 'products', None,
+                         f"Deleted {len(deleted)} products: {', '.join(list(deleted.values())[:10])}"
+                         + (' ...' if len(deleted) > 10 else ''))
+        return jsonify({'success': True, 'deleted': sorted(deleted),
+                        'not_found': [i for i in product_ids if i not in deleted]})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+
 # ============= SUPPLIERS ROUTES =============
 @app.route('/suppliers')
 @login_required
@@ -338,28 +551,131 @@ def delete_supplier(supplier_id):
         supplier_name = supplier.supplier_name
         db.session.delete(supplier)
         db.session.commit()
+        purge_location_rows(Location.query.all(), supplier_ids=[supplier_id])
         log_activity('delete_supplier', 'suppliers', supplier_id, f"Deleted supplier '{supplier_name}'")
         return jsonify({'success': True, 'message': 'Supplier deleted'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/api/suppliers/bulk-delete', methods=['POST'])
+@login_required
+def bulk_delete_suppliers():
+    """Delete many suppliers, with their purchases and purchase orders, in one transaction (API)"""
+    try:
+        supplier_ids = sorted({int(i) for i in (request.get_json() or {}).get('supplier_ids', [])})
+        if not supplier_ids:
+            return jsonify({'success': False, 'error': 'supplier_ids is required'}), 400
+        
+        deleted = bulk_delete(Supplier, Supplier.supplier_id, Supplier.supplier_name, supplier_ids)
+        db.session.commit()
+        purge_location_rows(Location.query.all(), supplier_ids=deleted)
+        if deleted:
+            log_activity('bulk_delete_suppliers', 'suppliers', None,
+                         f"Deleted {len(deleted)} suppliers: {', '.join(list(deleted.values())[:10])}"
+                         + (' ...' if len(deleted) > 10 else ''))
+        return jsonify({'success': True, 'deleted': sorted(deleted),
+                        'not_found': [i for i in supplier_ids if i not in deleted]})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+
 # ============= INVENTORY ROUTES =============
 @app.route('/inventory')
 @login_required
 def inventory():
-    """Inventory management page"""
-    inventory_items = db.session.query(Inventory, Product).join(
+    """Inventory management page (paginated, sortable, filterable)"""
+    sort_columns = {
+        'id': Inventory.inventory_id,
+        'name': Product.product_name,
+        'stock': Inventory.stock_quantity,
+        'restock': Inventory.restock_date
+    }
+    params = list_params(sort_columns, 'id')
+    q = request.args.get('q', '').strip()
+    category = request.args.get('category', '').strip()
+    status = request.args.get('status', '')
+    
+    query = db.session.query(Inventory, Product).join(
         Product, Inventory.product_id == Product.product_id
-    ).all()
-    products = Product.query.all()
-    return render_template('inventory.html', inventory_items=inventory_items, products=products)
+    )
+    match = product_match_clause(q)
+    if match is not None:
+        query = query.filter(match)
+    if category:
+        query = query.filter(Product.category == category)
+    if status == 'critical':
+        query = query.filter(Inventory.stock_quantity < 10)
+    elif status == 'low':
+        query = query.filter(Inventory.stock_quantity >= 10, Inventory.stock_quantity < 20)
+    elif status == 'healthy':
+        query = query.filter(Inventory.stock_quantity >= 20)
+    
+    def table():
+        page = Page(query, sort_columns[params['sort']], Inventory.inventory_id, params['dir'],
+                    params['after'], params['before'], params['per_page'], params['page'])
+        return render_template('fragments/inventory_table.html', inventory_items=page.items, page=page, params=params)
+    
+    table_html = cached_fragment('inventory_table', ('inventory', 'products'), table, vary=request.query_string)
+    return render_template('inventory.html', table=table_html, params=params,
+                           q=q, category=category, status=status)
+
+def inventory_items(names):
+    """/api/inventory rows from the in-memory stock index, with product names by id"""
+    return [{
+        'inventory_id': inventory_id,
+        'product_id': product_id,
+        'product_name': names.get(product_id),
+        'stock_quantity': stock,
+        'restock_date': restock_date.strftime('%Y-%m-%d') if restock_date else None
+    } for product_id, inventory_id, stock, restock_date in stock_index.items()]
 
 @app.route('/api/inventory', methods=['GET'])
 def get_inventory():
-    """Get all inventory items (API)"""
-    inventory_items = Inventory.query.all()
-    return jsonify([i.to_dict() for i in inventory_items])
+    """Get all inventory items (API), served from the in-memory stock index"""
+    return jsonify(inventory_items(dict(db.session.query(Product.product_id, Product.product_name).all())))
+
+@app.route('/api/inventory/low-stock', methods=['GET'])
+def get_low_stock():
+    """Products below their reorder point, lowest stock first (API)"""
+    low = stock_index.low_stock(limit=request.args.get('limit', type=int))
+    names = dict(db.session.query(Product.product_id, Product.product_name)
+                 .filter(Product.product_id.in_([l[0] for l in low])).all())
+    return jsonify([{
+        'product_id': product_id,
+        'product_name': names.get(product_id),
+        'stock_quantity': stock,
+        'reorder_point': round(reorder_point, 1)
+    } for product_id, stock, reorder_point in low])
+
+@app.route('/api/inventory/as-of', methods=['GET'])
+def inventory_as_of():
+    """
+    Stock per product at the end of a given day, from the stock movement ledger (API).
+    The day is a UTC day unless ?tz= names a time zone (e.g. Asia/Kolkata).
+    """
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'date is required in YYYY-MM-DD format'}), 400
+    tz = request.args.get('tz', 'UTC')
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        return jsonify({'success': False, 'error': f"Unknown time zone '{tz}'"}), 400
+    
+    as_of = end_of_day(day, zone)
+    items = stock_as_of(
+        as_of,
+        product_id=request.args.get('product_id', type=int),
+        after=request.args.get('after', type=int),
+        limit=max(1, min(request.args.get('limit', 1000, type=int), MAX_AS_OF_ROWS))
+    )
+    start = ledger_start()
+    return jsonify({'success': True, 'date': day.strftime('%Y-%m-%d'), 'tz': tz,
+                    'as_of_utc': as_of.strftime('%Y-%m-%d %H:%M:%S'),
+                    'history_starts_utc': start.strftime('%Y-%m-%d %H:%M:%S') if start else None,
+                    'items': items})
 
 @app.route('/api/inventory/<int:inventory_id>', methods=['PUT'])
 @login_required
@@ -373,6 +689,9 @@ def update_inventory(inventory_id):
         inventory.stock_quantity = int(data.get('stock_quantity', inventory.stock_quantity))
         if 'restock_date' in data and data['restock_date']:
             inventory.restock_date = datetime.strptime(data['restock_date'], '%Y-%m-%d')
+        if inventory.stock_quantity != old_quantity:
+            record_movement(inventory.product_id, inventory.stock_quantity - old_quantity,
+                            inventory.stock_quantity, 'adjustment', inventory_id)
         
         db.session.commit()
         log_activity('edit_inventory', 'inventory', inventory_id, 
@@ -386,10 +705,37 @@ def update_inventory(inventory_id):
 @app.route('/sales')
 @login_required
 def sales():
-    """Sales management page"""
-    sales_records = Sale.query.order_by(Sale.sale_date.desc()).all()
-    products = Product.query.all()
-    return render_template('sales.html', sales=sales_records, products=products)
+    """Sales management page (paginated, sortable, filterable)"""
+    sort_columns = {
+        'id': Sale.sale_id,
+        'date': Sale.sale_date,
+        'quantity': Sale.quantity_sold
+    }
+    params = list_params(sort_columns, 'date', 'desc')
+    product_id = request.args.get('product_id', type=int)
+    date_from = request.args.get('date_from', '')
+    date_to = request.args.get('date_to', '')
+    
+    query = Sale.query.options(db.joinedload(Sale.product))
+    if product_id:
+        query = query.filter(Sale.product_id == product_id)
+    try:
+        if date_from:
+            query = query.filter(Sale.sale_date >= datetime.strptime(date_from, '%Y-%m-%d').date())
+        if date_to:
+            query = query.filter(Sale.sale_date <= datetime.strptime(date_to, '%Y-%m-%d').date())
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.', 'danger')
+    
+    def table():
+        page = Page(query, sort_columns[params['sort']], Sale.sale_id, params['dir'],
+                    params['after'], params['before'], params['per_page'], params['page'])
+        return render_template('fragments/sales_table.html', sales=page.items, page=page, params=params)
+    
+    table_html = cached_fragment('sales_table', ('sales', 'products'), table, vary=request.query_string)
+    selected_product = db.session.get(Product, product_id) if product_id else None
+    return render_template('sales.html', table=table_html, params=params,
+                           selected_product=selected_product, date_from=date_from, date_to=date_to)
 
 @app.route('/api/sales', methods=['GET'])
 def get_sales():
@@ -397,6 +743,11 @@ def get_sales():
     sales = Sale.query.all()
     return jsonify([s.to_dict() for s in sales])
 
+@app.route('/api/sales/summary', methods=['GET'])
+def sales_summary():
+    """Sales quantity and revenue by day, week, month, product or category (API)"""
+    return summary_response('sales', ('sales', 'products'))
+
 @app.route('/api/sales', methods=['POST'])
 @login_required
 def create_sale():
@@ -406,11 +757,14 @@ def create_sale():
         product_id = int(data['product_id'])
         quantity_sold = int(data['quantity_sold'])
         
-        # Check inventory
-        inventory = Inventory.query.filter_by(product_id=product_id).first()
+        # Check inventory on the row itself: the stock index only locates it, since it can
+        # lag other processes' writes by up to STOCK_INDEX_CHECK_INTERVAL
+        indexed = stock_index.get(product_id)
+        inventory = db.session.get(Inventory, indexed['inventory_id']) if indexed else None
+        if inventory is None or inventory.product_id != product_id:
+            inventory = Inventory.query.filter_by(product_id=product_id).first()
         if not inventory:
             return jsonify({'success': False, 'error': 'Product not found in inventory'}), 400
-        
         if inventory.stock_quantity < quantity_sold:
             return jsonify({'success': False, 'error': f'Insufficient stock. Available: {inventory.stock_quantity}'}), 400
         
@@ -425,6 +779,8 @@ def create_sale():
         
         # Update inventory
         inventory.stock_quantity -= quantity_sold
+        db.session.flush()
+        record_movement(product_id, -quantity_sold, inventory.stock_quantity, 'sale', sale.sale_id)
         
         db.session.commit()
         log_activity('sale_recorded', 'sales', sale.sale_id, 
@@ -447,6 +803,7 @@ def delete_sale(sale_id):
         inventory = Inventory.query.filter_by(product_id=sale.product_id).first()
         if inventory:
             inventory.stock_quantity += sale.quantity_sold
+            record_movement(sale.product_id, sale.quantity_sold, inventory.stock_quantity, 'sale_deleted', sale_id)
         
         db.session.delete(sale)
         db.session.commit()
@@ -463,6 +820,11 @@ def get_purchases():
     purchases = Purchase.query.all()
     return jsonify([p.to_dict() for p in purchases])
 
+@app.route('/api/purchases/summary', methods=['GET'])
+def purchases_summary():
+    """Purchase quantity and value by day, week, month, product, category or supplier (API)"""
+    return summary_response('purchases', ('purchases', 'products', 'suppliers'))
+
 @app.route('/api/purchases', methods=['POST'])
 @login_required
 def create_purchase():
@@ -487,6 +849,8 @@ def create_purchase():
         if inventory:
             inventory.stock_quantity += quantity_purchased
             inventory.restock_date = purchase_date
+            db.session.flush()
+            record_movement(product_id, quantity_purchased, inventory.stock_quantity, 'purchase', purchase.purchase_id)
         
         db.session.commit()
         log_activity('purchase_recorded', 'purchases', purchase.purchase_id, 
@@ -496,6 +860,208 @@ def create_purchase():
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 400
 
+# ============= REORDER ROUTES =============
+@app.route('/api/reorder/suggestions', methods=['GET'])
+@login_required
+def get_reorder_suggestions():
+    """Draft purchase orders for every product that needs restocking, grouped by supplier (API)"""
+    model = request.args.get('model', 'linear')
+    if model not in FORECAST_MODELS:
+        return jsonify({'success': False, 'error': f"Unknown model '{model}'. Choose one of: {', '.join(FORECAST_MODELS)}"}), 400
+    return jsonify({'success': True, 'model': model, **reorder_suggestions(model)})
+
+@app.route('/api/reorder/points', methods=['POST'])
+@login_required
+def update_reorder_points_route():
+    """Recompute and store reorder points for every product; low-stock listings use them (API)"""
+    model = (request.get_json(silent=True) or {}).get('model', 'linear')
+    if model not in FORECAST_MODELS:
+        return jsonify({'success': False, 'error': f"Unknown model '{model}'. Choose one of: {', '.join(FORECAST_MODELS)}"}), 400
+    try:
+        updated = update_reorder_points(model)
+        log_activity('reorder_points_updated', 'reorder_points', None,
+                     f"Updated reorder points of {updated} products ({model} model)")
+        return jsonify({'success': True, 'model': model, 'updated': updated})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/reorder/accept', methods=['POST'])
+@login_required
+def accept_reorder_suggestions():
+    """Create open purchase orders from accepted drafts in one transaction (API)"""
+    try:
+        data = request.get_json()
+        orders = create_purchase_orders(data['orders'])
+        for order in orders:
+            log_activity('purchase_order_created', 'purchase_orders', order.order_id,
+                        f"Created purchase order for {sum(l.quantity_ordered for l in order.lines)} units from '{order.supplier.supplier_name}'")
+        return jsonify({'success': True, 'orders': [o.to_dict() for o in orders]}), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/purchase-orders', methods=['GET'])
+@login_required
+def get_purchase_orders():
+    """Get purchase orders, optionally filtered by status (API)"""
+    query = PurchaseOrder.query.order_by(PurchaseOrder.order_id.desc())
+    status = request.args.get('status')
+    if status:
+        query = query.filter_by(status=status)
+    limit = max(1, min(request.args.get('limit', 100, type=int), MAX_PURCHASE_ORDERS))
+    return jsonify([o.to_dict() for o in query.limit(limit).all()])
+
+@app.route('/api/purchase-orders/<int:order_id>/receive', methods=['POST'])
+@login_required
+def receive_purchase_order(order_id):
+    """Book an order's open lines as purchases and restock inventory (API)"""
+    order = PurchaseOrder.query.get_or_404(order_id)
+    try:
+        data = request.get_json(silent=True) or {}
+        # Optional {"lines": {"<line_id>": quantity_received}}; unlisted open lines are received in full
+        quantities = {int(k): int(v) for k, v in data.get('lines', {}).items()}
+        now = datetime.now()
+        
+        for line in order.lines:
+            if line.received_at is not None:
+                continue
+            quantity = quantities.get(line.line_id, line.quantity_ordered)
+            line.quantity_received = quantity
+            line.received_at = now
+            if quantity <= 0:
+                continue
+            purchase = Purchase(
+                product_id=line.product_id,
+                supplier_id=order.supplier_id,
+                quantity_purchased=quantity,
+                purchase_date=now
+            )
+            db.session.add(purchase)
+            inventory = Inventory.query.filter_by(product_id=line.product_id).first()
+            if inventory:
+                inventory.stock_quantity += quantity
+                inventory.restock_date = now
+                db.session.flush()
+                record_movement(line.product_id, quantity, inventory.stock_quantity, 'purchase', purchase.purchase_id)
+        
+        order.status = 'received'
+        db.session.commit()
+        log_activity('purchase_order_received', 'purchase_orders', order.order_id,
+                    f"Received purchase order from '{order.supplier.supplier_name}'")
+        return jsonify({'success': True, 'order': order.to_dict()})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+# ============= LOCATION ROUTES =============
+def selected_locations():
+    """Locations named by repeated ?location_id= parameters, or all of them"""
+    location_ids = request.args.getlist('location_id', type=int)
+    query = Location.query.order_by(Location.location_id)
+    if location_ids:
+        query = query.filter(Location.location_id.in_(location_ids))
+    return query.all()
+
+@app.route('/api/locations', methods=['GET'])
+def get_locations():
+    """Get all stores and warehouses (API)"""
+    locations = Location.query.order_by(Location.location_id).all()
+    return jsonify([l.to_dict() for l in locations])
+
+@app.route('/api/locations', methods=['POST'])
+@login_required
+def create_location():
+    """Create a location and its shard database (API)"""
+    try:
+        data = request.get_json()
+        location = Location(
+            name=data['name'],
+            location_type=data.get('location_type', 'store')
+        )
+        db.session.add(location)
+        db.session.flush()
+        shard_for(location)
+        db.session.commit()
+        log_activity('add_location', 'locations', location.location_id, f"Added {location.location_type} '{location.name}'")
+        return jsonify({'success': True, 'location': location.to_dict()}), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/locations/<int:location_id>/inventory', methods=['GET'])
+def get_location_inventory(location_id):
+    """Stock held at one location (API)"""
+    location = Location.query.get_or_404(location_id)
+    return jsonify(location_inventory(location))
+
+@app.route('/api/locations/<int:location_id>/inventory/<int:product_id>', methods=['PUT'])
+@login_required
+def update_location_inventory(location_id, product_id):
+    """Set a product's stock at one location (API)"""
+    location = Location.query.get_or_404(location_id)
+    Product.query.get_or_404(product_id)
+    try:
+        data = request.get_json()
+        restock_date = datetime.strptime(data['restock_date'], '%Y-%m-%d').date() if data.get('restock_date') else None
+        stock_quantity = set_location_stock(location, product_id, int(data['stock_quantity']), restock_date)
+        log_activity('update_location_inventory', 'location_stock', product_id,
+                    f"Set stock of product {product_id} at '{location.name}' to {stock_quantity}")
+        return jsonify({'success': True, 'location_id': location_id, 'product_id': product_id,
+                        'stock_quantity': stock_quantity, 'note': LOCATION_SCOPE_NOTE})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/locations/<int:location_id>/sales', methods=['POST'])
+@login_required
+def create_location_sale(location_id):
+    """Record a sale at one location and update its stock (API)"""
+    location = Location.query.get_or_404(location_id)
+    try:
+        data = request.get_json()
+        product = Product.query.get_or_404(int(data['product_id']))
+        sale_date = datetime.strptime(data['sale_date'], '%Y-%m-%d') if 'sale_date' in data else datetime.now()
+        sale = record_location_sale(location, product.product_id, int(data['quantity_sold']), sale_date.date())
+        log_activity('sale_recorded', 'location_sales', sale['sale_id'],
+                    f"Recorded sale of {sale['quantity_sold']} units of '{product.product_name}' at '{location.name}'")
+        return jsonify({'success': True, 'sale': sale, 'note': LOCATION_SCOPE_NOTE}), 201
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/locations/<int:location_id>/purchases', methods=['POST'])
+@login_required
+def create_location_purchase(location_id):
+    """Record a purchase received at one location and update its stock (API)"""
+    location = Location.query.get_or_404(location_id)
+    try:
+        data = request.get_json()
+        product = Product.query.get_or_404(int(data['product_id']))
+        supplier = Supplier.query.get_or_404(int(data['supplier_id']))
+        purchase_date = datetime.strptime(data['purchase_date'], '%Y-%m-%d') if 'purchase_date' in data else datetime.now()
+        purchase = record_location_purchase(location, product.product_id, supplier.supplier_id,
+                                            int(data['quantity_purchased']), purchase_date.date())
+        log_activity('purchase_recorded', 'location_purchases', purchase['purchase_id'],
+                    f"Recorded purchase of {purchase['quantity_purchased']} units of '{product.product_name}' at '{location.name}'")
+        return jsonify({'success': True, 'purchase': purchase, 'note': LOCATION_SCOPE_NOTE}), 201
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/locations/stock', methods=['GET'])
+def get_stock_across_locations():
+    """Stock per product summed over locations (API)"""
+    product_ids = request.args.getlist('product_id', type=int)
+    return jsonify(stock_across_locations(selected_locations(), product_ids))
+
+@app.route('/api/locations/sales', methods=['GET'])
+def get_sales_across_locations():
+    """Units sold per product summed over locations, optionally between start and end dates (API)"""
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'start and end must be YYYY-MM-DD'}), 400
+    return jsonify(sales_across_locations(selected_locations(), start, end))
+
 # ============= AI INSIGHTS ROUTES =============
 @app.route('/ai-insights')
 @login_required
@@ -503,23 +1069,238 @@ def ai_insights():
     """AI insights and predictions page"""
     return render_template('ai_insights.html')
 
+INSIGHT_PANELS = ('predict', 'sales_trend', 'category_sales')
+# Days of sales history (up to today) each panel reads; category sales uses per-product totals instead
+INSIGHT_HISTORY_DAYS = {'predict': MAX_HISTORY_DAYS, 'sales_trend': SALES_TREND_DAYS + 1}
+
+class PanelError(Exception):
+    """An insights panel that computed {'success': False, ...}; kept out of the cache"""
+
+    def __init__(self, result):
+        super().__init__(result.get('error'))
+        self.result = result
+
+def insight_panel(panel, model='linear', sales=None):
+    """
+    Cached JSON body of one AI insights panel. sales returns the sales
+    history shared by the panels of one request; without it each panel reads its own.
+    Raises PanelError when the panel fails.
+    """
+    sales = sales or (lambda: None)
+    def checked(compute):
+        def run():
+            result = compute()
+            if not result.get('success', True):
+                raise PanelError(result)
+            return result
+        return run
+    if panel == 'predict':
+        return cached_json_body('api_predict', ('sales', 'products', 'inventory', 'forecast_accuracy'),
+                                checked(lambda: predict_low_stock(model, sales())), vary=(model, datetime.now().date()))
+    if panel == 'sales_trend':
+        return cached_json_body('api_sales_trend', ('sales',), checked(lambda: get_sales_trend_data(sales())),
+                                vary=datetime.now().date())
+    return cached_json_body('api_category_sales', ('sales', 'products'), checked(get_category_sales))
+
+def insight_panel_response(panel, model='linear'):
+    try:
+        return app.response_class(insight_panel(panel, model), mimetype='application/json')
+    except PanelError as e:
+        return jsonify(e.result)
+
+def unknown_model_response(model):
+    return jsonify({'success': False, 'error': f"Unknown model '{model}'. Choose one of: {', '.join(FORECAST_MODELS)}"}), 400
+
 @app.route('/api/predict', methods=['GET'])
 def predict():
     """AI prediction endpoint"""
-    result = predict_low_stock()
-    return jsonify(result)
+    model = request.args.get('model', 'linear')
+    if model not in FORECAST_MODELS:
+        return unknown_model_response(model)
+    return insight_panel_response('predict', model)
 
 @app.route('/api/sales-trend', methods=['GET'])
 def sales_trend():
     """Sales trend data for charts"""
-    result = get_sales_trend_data()
-    return jsonify(result)
+    return insight_panel_response('sales_trend')
 
 @app.route('/api/category-sales', methods=['GET'])
 def category_sales():
     """Category sales data for charts"""
-    result = get_category_sales()
-    return jsonify(result)
+    return insight_panel_response('category_sales')
+
+@app.route('/api/insights', methods=['GET'])
+def insights():
+    """
+    Predictions, sales trend and category sales in one response, from one read of the sales
+    history. success is false, with each failed panel's error under errors, if any panel fails.
+    """
+    model = request.args.get('model', 'linear')
+    if model not in FORECAST_MODELS:
+        return unknown_model_response(model)
+    fields = [f for f in request.args.get('fields', ','.join(INSIGHT_PANELS)).split(',') if f]
+    unknown = [f for f in fields if f not in INSIGHT_PANELS]
+    if unknown or not fields:
+        return jsonify({'success': False, 'error': f"fields must be from: {', '.join(INSIGHT_PANELS)}"}), 400
+    fields = list(dict.fromkeys(fields))
+    
+    # Panels missing from the cache share one read of the window the longest of them needs
+    loaded = []
+    def sales():
+        if not loaded:
+            days = max(INSIGHT_HISTORY_DAYS.get(f, 1) for f in fields)
+            loaded.append(history('sales', start_date=datetime.now().date() - timedelta(days=days - 1)))
+        return loaded[0]
+    
+    # Cached panel bodies are already JSON; splice them in rather than re-encoding
+    bodies, errors = [], {}
+    for field in fields:
+        try:
+            body = insight_panel(field, model, sales).rstrip()
+        except PanelError as e:
+            body = app.json.dumps(e.result)
+            errors[field] = e.result.get('error')
+        bodies.append(f'"{field}":{body}')
+    tail = f'"errors":{app.json.dumps(errors)},"success":false' if errors else '"success":true'
+    return app.response_class(f'{{"model":"{model}",{",".join(bodies)},{tail}}}\n', mimetype='application/json')
+
+@app.route('/api/forecast-accuracy', methods=['GET'])
+def forecast_accuracy():
+    """Stored backtest accuracy per product (optionally for one model)"""
+    query = ForecastAccuracy.query
+    model = request.args.get('model')
+    if model:
+        query = query.filter_by(model=model)
+    return jsonify([a.to_dict() for a in query.order_by(ForecastAccuracy.product_id).all()])
+
+# ============= REPORT ROUTES =============
+def report_params():
+    """Inventory report for the window_days query parameter, filtered by abc, xyz, category and dead_stock"""
+    window_days = request.args.get('window_days', DEFAULT_WINDOW_DAYS, type=int)
+    if not 1 <= window_days <= MAX_WINDOW_DAYS:
+        raise ValueError(f'window_days must be between 1 and {MAX_WINDOW_DAYS}')
+    report = inventory_report(window_days, ttl=app.config['FRAGMENT_CACHE_TTL'])
+    
+    for column in ('abc', 'xyz', 'category'):
+        value = request.args.get(column)
+        if value:
+            report = report[report[column] == value]
+    if request.args.get('dead_stock') in ('1', 'true'):
+        report = report[report['dead_stock']]
+    return window_days, report
+
+@app.route('/api/reports/inventory', methods=['GET'])
+@login_required
+def inventory_report_api():
+    """Turnover, days of cover, ABC/XYZ class, sell-through and dead stock per product (API)"""
+    limit = request.args.get('limit', DEFAULT_REPORT_ROWS, type=int)
+    if not 1 <= limit <= MAX_REPORT_ROWS:
+        return jsonify({'success': False, 'error': f'limit must be between 1 and {MAX_REPORT_ROWS}'}), 400
+    try:
+        window_days, report = report_params()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({
+        'success': True,
+        'window_days': window_days,
+        'summary': report_summary(report),
+        'items': report_records(report.head(limit))
+    })
+
+@app.route('/api/reports/inventory/export', methods=['GET'])
+@login_required
+def export_inventory_report():
+    """Download the inventory report as CSV"""
+    try:
+        window_days, report = report_params()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    filename = f"inventory_report_{datetime.now().strftime('%Y-%m-%d')}_{window_days}d.csv"
+    return app.response_class(report.to_csv(index=False), mimetype='text/csv',
+                              headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# ============= DIAGNOSTICS =============
+@app.route('/api/pool-stats', methods=['GET'])
+@login_required
+def get_pool_stats():
+    """Connection pool metrics for the writer and read-only pools (admin only)"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+    return jsonify({'success': True, **pool_stats(app)})
+
+# ============= CLI COMMANDS =============
+@app.cli.command('backtest')
+@click.option('--model', 'models', multiple=True, type=click.Choice(FORECAST_MODELS),
+              help='Model to evaluate (repeatable, default: all)')
+@click.option('--horizon', default=DEFAULT_HORIZON_DAYS, show_default=True, help='Forecast horizon in days')
+@click.option('--origins', default=DEFAULT_ORIGINS, show_default=True, help='Number of rolling forecast origins')
+@click.option('--workers', default=None, type=int, help='Worker processes (default: CPU count)')
+def backtest_command(models, horizon, origins, workers):
+    """Backtest forecast models against sales history and store accuracy"""
+    result = run_backtest(models or FORECAST_MODELS, horizon=horizon, origins=origins, workers=workers)
+    if not result['success']:
+        raise click.ClickException(result['error'])
+    click.echo(f"Evaluated {result['products']} products at {result['origins']} origins "
+               f"({result['horizon_days']}-day horizon)")
+    for model, stats in result['models'].items():
+        click.echo(f"  {model:<15} MAE={stats['mae']}  MAPE={stats['mape']}  "
+                   f"stockout alerts={stats['stockout_alerts']}  hit rate={stats['stockout_hit_rate']}")
+
+@app.cli.command('prune-activity-log')
+@click.option('--keep-days', default=None, type=int,
+              help='Days of activity kept in the database (default: ACTIVITY_LOG_RETENTION_DAYS)')
+@click.option('--delete-only', is_flag=True, help='Delete old rows without archiving them')
+@click.option('--drop-archives-after-days', default=None, type=int,
+              help='Also delete archived months older than this many days')
+def prune_activity_log_command(keep_days, delete_only, drop_archives_after_days):
+    """Apply the activity log retention policy"""
+    keep_days = keep_days if keep_days is not None else app.config['ACTIVITY_LOG_RETENTION_DAYS']
+    archive_dir = app.config['ACTIVITY_ARCHIVE_DIR']
+    cutoff = datetime.utcnow() - timedelta(days=keep_days)
+    
+    removed = archive_activity_logs(cutoff, archive_dir, delete_only=delete_only)
+    action = 'Deleted' if delete_only else f'Archived to {archive_dir}'
+    click.echo(f"{action}: {removed} activity log rows older than {cutoff:%Y-%m-%d}")
+    
+    if drop_archives_after_days is not None:
+        dropped = drop_archives(archive_dir, datetime.utcnow() - timedelta(days=drop_archives_after_days))
+        click.echo(f"Dropped {len(dropped)} archive partitions: {', '.join(dropped) or 'none'}")
+
+@app.cli.command('compact-history')
+@click.option('--through', default=None, help='Last day to archive, YYYY-MM-DD (default: end of last month)')
+def compact_history_command(through):
+    """Compact closed periods of sales and purchases into the columnar history archive"""
+    through = datetime.strptime(through, '%Y-%m-%d').date() if through else default_closed_through()
+    for kind in ARCHIVE_SOURCES:
+        meta = compact(kind, through)
+        click.echo(f"{kind}: {meta['rows']} product-day rows for {meta['products']} products "
+                   f"archived through {meta['closed_through']}")
+
+@app.cli.command('update-reorder-points')
+@click.option('--model', default='linear', show_default=True, type=click.Choice(FORECAST_MODELS),
+              help='Forecast model the reorder points are computed from')
+def update_reorder_points_command(model):
+    """Recompute the reorder points low-stock listings use (run periodically, e.g. nightly)"""
+    click.echo(f"Reorder points stored for {update_reorder_points(model)} products")
+
+@app.cli.command('snapshot-stock')
+def snapshot_stock_command():
+    """Snapshot ledger-derived stock for every product (run periodically, e.g. nightly)"""
+    click.echo(f"Snapshot written for {take_stock_snapshot()} products")
+
+@app.cli.command('reconcile-stock')
+@click.option('--repair', is_flag=True, help='Write reconciliation movements for mismatched products')
+def reconcile_stock_command(repair):
+    """Check the stock movement ledger against current inventory"""
+    mismatches = reconcile_stock(repair=repair)
+    for m in mismatches:
+        click.echo(f"Product {m['product_id']}: ledger {m['ledger_stock']}, inventory {m['current_stock']}")
+    if not mismatches:
+        click.echo('Ledger matches current stock')
+    elif repair:
+        click.echo(f"Repaired {len(mismatches)} products")
+    else:
+        raise click.ClickException(f"{len(mismatches)} products do not match the ledger; rerun with --repair")
 
 # ============= ERROR HANDLERS =============
 @app.errorhandler(404)
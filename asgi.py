@@ -0,0 +1,150 @@
+"""
+Optional asyncio serving mode for the read-only JSON APIs.
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+GET /api/products, /api/inventory, /api/sales and /api/predict are served by
+coroutines on an async database engine with a bounded connection pool, so a
+waiting client costs a coroutine rather than a worker thread. /api/inventory
+reads stock from the Flask app's in-memory stock index and /api/predict
+serves the same cached insight panel as app.py, so only the product names,
+product and sale lists come from the async engine. Every other URL is handed
+to the Flask app in app.py, which keeps its login, pages and writes. Both use
+the models in models/database.py and return the same JSON.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, inventory_items, insight_panel, unknown_model_response, PanelError
+from models.database import db, Product, Sale
+from models.read_pool import read_only
+from ai.forecasting import FORECAST_MODELS
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+_engine = None
+_sessions = None
+_predictions_in_flight = {}
+
+
+def async_database_url():
+    """The Flask app's database URL with its async driver"""
+    with flask_app.app_context():
+        url = db.engine.url
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def sessions():
+    global _engine, _sessions
+    if _sessions is None:
+        _engine = create_async_engine(
+            async_database_url(),
+            pool_size=flask_app.config['ASYNC_POOL_SIZE'],
+            max_overflow=0,
+            pool_timeout=flask_app.config['ASYNC_POOL_TIMEOUT']
+        )
+        _sessions = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+    return _sessions
+
+
+class JSONResponse(Response):
+    """Serialized with Flask's JSON provider so responses match app.py byte for byte"""
+    media_type = 'application/json'
+
+    def render(self, content):
+        with flask_app.app_context():
+            return flask_app.json.response(content).get_data()
+
+
+async def _all(statement):
+    async with sessions()() as session:
+        return (await session.execute(statement)).scalars().all()
+
+
+# ============= READ ROUTES =============
+async def get_products(request):
+    """Get all products (API)"""
+    # Plain rows: to_dict()'s columns without building ORM objects
+    async with sessions()() as session:
+        rows = await session.execute(select(Product.product_id, Product.product_name, Product.category, Product.price))
+        return JSONResponse([dict(row) for row in rows.mappings()])
+
+
+async def get_inventory(request):
+    """Get all inventory items (API), served from the in-memory stock index"""
+    async with sessions()() as session:
+        names = dict((await session.execute(select(Product.product_id, Product.product_name))).all())
+    # The index reloads itself at most once per STOCK_INDEX_CHECK_INTERVAL, with
+    # one primary key lookup, so it is read on the event loop
+    with flask_app.app_context(), read_only():
+        return JSONResponse(inventory_items(names))
+
+
+async def get_sales(request):
+    """Get all sales (API)"""
+    sales = await _all(select(Sale).options(joinedload(Sale.product)))
+    return JSONResponse([s.to_dict() for s in sales])
+
+
+def _predict(model):
+    """(status, JSON body) of the cached predict panel, as app.py's /api/predict returns it"""
+    with flask_app.app_context(), read_only():
+        if model not in FORECAST_MODELS:
+            response, status = unknown_model_response(model)
+            return status, response.get_data(as_text=True)
+        try:
+            return 200, str(insight_panel('predict', model))
+        except PanelError as e:
+            return 200, flask_app.json.response(e.result).get_data(as_text=True)
+
+
+async def predict(request):
+    """AI prediction endpoint"""
+    model = request.query_params.get('model', 'linear')
+    # A cache miss runs the CPU bound forecast: keep it off the event loop, and
+    # let concurrent requests for the same model share one computation
+    task = _predictions_in_flight.get(model)
+    if task is None:
+        task = asyncio.ensure_future(run_in_threadpool(_predict, model))
+        _predictions_in_flight[model] = task
+        task.add_done_callback(lambda _: _predictions_in_flight.pop(model, None))
+    status, body = await asyncio.shield(task)
+    return Response(body, status_code=status, media_type='application/json')
+
+
+async def pool_exhausted(request, exc):
+    # Shed load instead of queueing clients past ASYNC_POOL_TIMEOUT
+    return JSONResponse({'success': False, 'error': 'Server busy, please retry'}, status_code=503,
+                        headers={'Retry-After': '1'})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if _engine is not None:
+        await _engine.dispose()
+
+
+routes = [
+    Route('/api/products', get_products, methods=['GET']),
+    Route('/api/inventory', get_inventory, methods=['GET']),
+    Route('/api/sales', get_sales, methods=['GET']),
+    Route('/api/predict', predict, methods=['GET']),
+    Mount('/', app=WSGIMiddleware(flask_app, workers=flask_app.config['ASYNC_WSGI_WORKERS'])),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan, exception_handlers={PoolTimeoutError: pool_exhausted})
@@ -0,0 +1,94 @@
+"""
+Benchmark: concurrent read API clients served by a fixed pool of sync Flask
+workers versus the asyncio serving mode in asgi.py.
+
+Both apps run in-process behind the same event loop: the sync side is the
+Flask app on SYNC_WORKERS threads (like gunicorn --threads), the async side is
+asgi.py with its bounded connection pool. Each level opens that many clients
+at once and every client makes REQUESTS_PER_CLIENT requests.
+
+Run from the project root (needs requirements-async.txt):
+    python benchmarks/async_reads.py
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+db_path = os.path.join(tempfile.mkdtemp(), 'bench_async_reads.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from app import app as flask_app
+from asgi import app as async_app
+from models.database import db, Product, Inventory, Sale
+
+ROUTES = ['/api/products', '/api/inventory', '/api/predict']
+CONCURRENCY = [10, 100, 500, 1000]
+REQUESTS_PER_CLIENT = 3
+SYNC_WORKERS = 16
+PRODUCTS = 200
+
+
+def seed():
+    with flask_app.app_context():
+        start = len(Product.query.all())
+        db.session.execute(db.insert(Product), [
+            {'product_name': f'Bench product {i}', 'category': f'Category {i % 10}', 'price': 10 + i % 90}
+            for i in range(PRODUCTS)
+        ])
+        db.session.execute(db.insert(Inventory), [
+            {'product_id': start + i + 1, 'stock_quantity': random.randint(0, 500)} for i in range(PRODUCTS)
+        ])
+        today = date.today()
+        db.session.execute(db.insert(Sale), [
+            {'product_id': random.randint(1, start + PRODUCTS), 'quantity_sold': random.randint(1, 5),
+             'sale_date': today - timedelta(days=random.randint(0, 90))}
+            for _ in range(PRODUCTS * 5)
+        ])
+        db.session.commit()
+
+
+async def run_level(asgi_app, clients):
+    """Return (requests per second, p95 latency in ms, failed or shed requests)"""
+    latencies = []
+    failures = [0]
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=120) as client:
+        async def one_client(n):
+            for i in range(REQUESTS_PER_CLIENT):
+                start = time.perf_counter()
+                response = await client.get(ROUTES[(n + i) % len(ROUTES)])
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    failures[0] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_client(n) for n in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    return len(latencies) / elapsed, p95, failures[0]
+
+
+async def main():
+    seed()
+    apps = {
+        f'sync ({SYNC_WORKERS} workers)': WSGIMiddleware(flask_app, workers=SYNC_WORKERS),
+        f"async (pool {flask_app.config['ASYNC_POOL_SIZE']})": async_app,
+    }
+    print(f"{'mode':<22}{'clients':>8}{'req/s':>10}{'p95 ms':>10}{'failed':>8}")
+    for clients in CONCURRENCY:
+        for name, asgi_app in apps.items():
+            rps, p95, failed = await run_level(asgi_app, clients)
+            print(f'{name:<22}{clients:>8}{rps:>10.0f}{p95:>10.1f}{failed:>8}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,309 @@
+"""
+Load test: replay a mix of POS sales, purchases, inventory edits, dashboard
+views and insights polling against a running instance, from many logged-in
+users at once, and report throughput, latency percentiles, error rates and
+SQLite lock failures per route.
+
+Start the app first (python app.py, or uvicorn asgi:app), then run from the
+project root:
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --users 50 --processes 4 --duration 60
+    python benchmarks/load_test.py --mix pos_sale=60,dashboard=30,insights=10
+    python benchmarks/load_test.py --mix-from instance/inventory.db
+
+Each virtual user registers (loadtest_<n>), logs in once and then loops:
+pick a scenario by weight, run it, wait an exponentially distributed think
+time. Users are spread over processes, one thread per user. Only the
+standard library is used.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+# Relative weights of each scenario
+DEFAULT_MIX = {
+    'pos_sale': 35,
+    'purchase': 5,
+    'inventory_edit': 5,
+    'dashboard': 25,
+    'list_pages': 10,
+    'insights': 20,
+}
+WRITE_SCENARIOS = ('pos_sale', 'purchase', 'inventory_edit')
+
+# activity_logs.action_type recorded by each write scenario, for --mix-from
+ACTIVITY_ACTIONS = {
+    'pos_sale': 'sale_recorded',
+    'purchase': 'purchase_recorded',
+    'inventory_edit': 'edit_inventory',
+}
+
+# The API returns str(e) for failed writes, so SQLite contention shows up in the body
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'SQLITE_BUSY')
+
+PASSWORD = 'loadtest-password'
+
+
+class Client:
+    """One virtual user with its own cookie session"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def request(self, method, path, payload=None, form=None):
+        """Returns (status, body); status 0 means the request never got a response"""
+        data, headers = None, {}
+        if payload is not None:
+            data, headers = json.dumps(payload).encode(), {'Content-Type': 'application/json'}
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+        except (urllib.error.URLError, OSError) as e:
+            return 0, str(e)
+
+    def login(self, username):
+        self.request('POST', '/register', form={
+            'username': username, 'email': f'{username}@loadtest.local',
+            'password': PASSWORD, 'confirm_password': PASSWORD
+        })
+        self.request('POST', '/login', form={'username': username, 'password': PASSWORD})
+        status, _ = self.request('GET', '/api/activity-log')
+        return status == 200
+
+
+class RouteStats:
+    """Latencies and failures per route label, merged across threads and processes"""
+
+    def __init__(self):
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, status, body):
+        ok = 200 <= status < 400
+        locked = not ok and any(marker in body for marker in LOCK_ERRORS)
+        with self._lock:
+            entry = self.routes.setdefault(route, {'latencies': [], 'errors': 0, 'locked': 0, 'no_response': 0})
+            entry['latencies'].append(seconds)
+            entry['errors'] += 0 if ok else 1
+            entry['locked'] += 1 if locked else 0
+            entry['no_response'] += 1 if status == 0 else 0
+
+    def merge(self, routes):
+        for route, other in routes.items():
+            entry = self.routes.setdefault(route, {'latencies': [], 'errors': 0, 'locked': 0, 'no_response': 0})
+            entry['latencies'].extend(other['latencies'])
+            for key in ('errors', 'locked', 'no_response'):
+                entry[key] += other[key]
+
+
+# ============= SCENARIOS =============
+# Each returns the requests to make as (route label, method, path, json payload)
+
+def pos_sale(catalog, rng):
+    return [('POST /api/sales', 'POST', '/api/sales',
+             {'product_id': rng.choice(catalog['products']), 'quantity_sold': rng.randint(1, 3)})]
+
+
+def purchase(catalog, rng):
+    return [('POST /api/purchases', 'POST', '/api/purchases',
+             {'product_id': rng.choice(catalog['products']), 'supplier_id': rng.choice(catalog['suppliers']),
+              'quantity_purchased': rng.randint(20, 100)})]
+
+
+def inventory_edit(catalog, rng):
+    inventory_id = rng.choice(catalog['inventory'])
+    return [('PUT /api/inventory/<id>', 'PUT', f'/api/inventory/{inventory_id}',
+             {'stock_quantity': rng.randint(20, 200)})]
+
+
+def dashboard(catalog, rng):
+    return [('GET /dashboard', 'GET', '/dashboard', None)]
+
+
+def list_pages(catalog, rng):
+    page = rng.choice(['/products', '/inventory', '/sales'])
+    # Pages are keyset-paginated, so only the first page is addressable without a cursor
+    return [(f'GET {page}', 'GET', f"{page}?dir={rng.choice(['asc', 'desc'])}", None)]
+
+
+def insights(catalog, rng):
+    # All AI insights panels in one combined request
+    return [('GET /api/insights', 'GET', '/api/insights', None)]
+
+
+SCENARIOS = {
+    'pos_sale': pos_sale,
+    'purchase': purchase,
+    'inventory_edit': inventory_edit,
+    'dashboard': dashboard,
+    'list_pages': list_pages,
+    'insights': insights,
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def mix_from_activity_log(db_path, mix):
+    """
+    Split the mix's total write weight between sales, purchases and inventory
+    edits in the proportions recorded in activity_logs.
+    """
+    with sqlite3.connect(db_path) as conn:
+        counts = dict(conn.execute(
+            'SELECT action_type, COUNT(*) FROM activity_logs WHERE action_type IN (?, ?, ?) GROUP BY action_type',
+            tuple(ACTIVITY_ACTIONS.values())
+        ).fetchall())
+    observed = {name: counts.get(action, 0) for name, action in ACTIVITY_ACTIONS.items()}
+    total = sum(observed.values())
+    if not total:
+        return mix
+    write_weight = sum(mix.get(name, 0) for name in WRITE_SCENARIOS)
+    mix = dict(mix)
+    for name in WRITE_SCENARIOS:
+        mix[name] = write_weight * observed[name] / total
+    return mix
+
+
+def load_catalog(base_url, timeout):
+    client = Client(base_url, timeout)
+    catalog = {}
+    for key, path, id_field in (('products', '/api/products', 'product_id'),
+                                ('inventory', '/api/inventory', 'inventory_id'),
+                                ('suppliers', '/api/suppliers', 'supplier_id')):
+        status, body = client.request('GET', path)
+        if status != 200:
+            raise SystemExit(f'Could not load {path} from {base_url} (status {status}): {body[:200]}')
+        catalog[key] = [row[id_field] for row in json.loads(body)]
+        if not catalog[key]:
+            raise SystemExit(f'{path} returned no rows; seed the database first')
+    return catalog
+
+
+def run_worker(base_url, usernames, catalog, mix, duration, think_ms, timeout, seed):
+    """One process: a thread per user until the deadline. Returns (per-route stats, failed logins)."""
+    stats = RouteStats()
+    deadline = time.monotonic() + duration
+    names, weights = zip(*mix.items())
+    failed_logins = []
+
+    def user_loop(username, rng):
+        client = Client(base_url, timeout)
+        if not client.login(username):
+            failed_logins.append(username)
+            return
+        while time.monotonic() < deadline:
+            scenario = SCENARIOS[rng.choices(names, weights)[0]]
+            for route, method, path, payload in scenario(catalog, rng):
+                start = time.perf_counter()
+                status, body = client.request(method, path, payload=payload)
+                stats.record(route, time.perf_counter() - start, status, body)
+            if think_ms:
+                time.sleep(min(rng.expovariate(1000 / think_ms), max(deadline - time.monotonic(), 0)))
+
+    threads = [
+        threading.Thread(target=user_loop, args=(username, random.Random(seed + i)), daemon=True)
+        for i, username in enumerate(usernames)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.routes, failed_logins
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+def report(stats, elapsed):
+    header = f"{'route':<28}{'requests':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}{'locked':>8}"
+    print(header)
+    print('-' * len(header))
+    totals = RouteStats()
+    for route in sorted(stats.routes):
+        entry = stats.routes[route]
+        totals.merge({'all': entry})
+        _print_row(route, entry, elapsed)
+    print('-' * len(header))
+    if totals.routes:
+        _print_row('all', totals.routes['all'], elapsed)
+
+
+def _print_row(route, entry, elapsed):
+    latencies = sorted(entry['latencies'])
+    n = len(latencies)
+    error_rate = entry['errors'] / n * 100 if n else 0
+    print(f"{route:<28}{n:>9}{n / elapsed:>8.1f}{percentile(latencies, 0.50) * 1000:>9.1f}"
+          f"{percentile(latencies, 0.95) * 1000:>9.1f}{percentile(latencies, 0.99) * 1000:>9.1f}"
+          f"{(latencies[-1] if latencies else 0) * 1000:>9.1f}{error_rate:>7.1f}%{entry['locked']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--processes', type=int, default=1, help='client processes the users are spread over')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--think-ms', type=float, default=500, help='mean pause between scenarios per user (0 = none)')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='scenario weights, e.g. pos_sale=35,purchase=5,dashboard=25,insights=20')
+    parser.add_argument('--mix-from', metavar='SQLITE_DB',
+                        help='split write weight like the activity log of this database')
+    parser.add_argument('--user-prefix', default='loadtest')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    mix = mix_from_activity_log(args.mix_from, args.mix) if args.mix_from else args.mix
+    catalog = load_catalog(args.url, args.timeout)
+    usernames = [f'{args.user_prefix}_{i}' for i in range(args.users)]
+    processes = max(1, min(args.processes, args.users))
+    print(f"{args.users} users in {processes} process(es) for {args.duration:.0f}s against {args.url}")
+    print('mix: ' + ', '.join(f'{name}={weight:g}' for name, weight in mix.items()))
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(run_worker, [
+            (args.url, usernames[i::processes], catalog, mix, args.duration, args.think_ms, args.timeout,
+             args.seed + i * args.users)
+            for i in range(processes)
+        ])
+    elapsed = time.perf_counter() - start
+
+    stats = RouteStats()
+    failed_logins = []
+    for routes, failed in results:
+        stats.merge(routes)
+        failed_logins.extend(failed)
+    if failed_logins:
+        print(f'{len(failed_logins)} users could not log in: {", ".join(failed_logins[:5])}')
+    print()
+    report(stats, max(elapsed, args.duration))
+
+
+if __name__ == '__main__':
+    main()
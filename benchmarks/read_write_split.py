@@ -0,0 +1,141 @@
+"""
+Benchmark: POS write latency while analytics reads run, with and without
+the read-only connection pool.
+
+One thread records sales (POST /api/sales) back to back while
+ANALYTICS_CLIENTS threads (more than the writer pool holds) poll the SQL
+summary endpoints with the fragment cache off, so every request runs its
+aggregate query. The same write load is measured alone, with analytics
+sharing the writer pool (READ_POOL_ENABLED off) and with analytics on the
+read pool. Exits non-zero unless the read pool cuts the p95 write latency
+under analytics load by at least MIN_P95_IMPROVEMENT times and keeps the
+p50 within MAX_P50_SLOWDOWN times the idle p50.
+
+The split removes waits for a writer connection. The read pool has one
+connection per CPU and no overflow, so at most that many analytics queries
+compete with the writer for the CPU and the rest queue for a connection.
+
+Run from the project root:
+    python benchmarks/read_write_split.py
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+db_path = os.path.join(tempfile.mkdtemp(), 'bench_read_write_split.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models.database import db, Product, Inventory, Sale, User
+from models.read_pool import pool_stats
+
+PRODUCTS = 500
+SALES = 200000
+ANALYTICS_CLIENTS = 16
+DURATION = 10
+ANALYTICS_ROUTES = ['/api/sales/summary?group_by=product', '/api/sales/summary?group_by=week',
+                    '/api/sales/summary?group_by=category', '/api/purchases/summary?group_by=month']
+MIN_P95_IMPROVEMENT = 5.0
+MAX_P50_SLOWDOWN = 10.0
+
+
+def seed():
+    with app.app_context():
+        start = len(Product.query.all())
+        db.session.execute(db.insert(Product), [
+            {'product_name': f'Bench product {i}', 'category': f'Category {i % 10}', 'price': 10 + i % 90}
+            for i in range(PRODUCTS)
+        ])
+        db.session.execute(db.insert(Inventory), [
+            {'product_id': start + i + 1, 'stock_quantity': 10 ** 6} for i in range(PRODUCTS)
+        ])
+        today = date.today()
+        db.session.execute(db.insert(Sale), [
+            {'product_id': random.randint(1, start + PRODUCTS), 'quantity_sold': random.randint(1, 5),
+             'sale_date': today - timedelta(days=random.randint(0, 364))}
+            for _ in range(SALES)
+        ])
+        for i in range(ANALYTICS_CLIENTS + 1):
+            user = User(username=f'bench_{i}', email=f'bench_{i}@bench.local')
+            user.set_password('bench')
+            db.session.add(user)
+        db.session.commit()
+
+
+def client(n):
+    c = app.test_client()
+    c.post('/login', data={'username': f'bench_{n}', 'password': 'bench'})
+    return c
+
+
+def run(analytics, read_pool):
+    """p50, p95 and max write latency in ms, sales recorded and analytics requests served"""
+    app.config['READ_POOL_ENABLED'] = read_pool
+    stop = threading.Event()
+    served = [0]
+
+    def analytics_loop(n):
+        c = client(n + 1)
+        while not stop.is_set():
+            c.get(ANALYTICS_ROUTES[served[0] % len(ANALYTICS_ROUTES)])
+            served[0] += 1
+
+    threads = [threading.Thread(target=analytics_loop, args=(n,)) for n in range(ANALYTICS_CLIENTS if analytics else 0)]
+    for thread in threads:
+        thread.start()
+
+    writer = client(0)
+    latencies = []
+    deadline = time.monotonic() + DURATION
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        response = writer.post('/api/sales', json={'product_id': random.randint(1, PRODUCTS), 'quantity_sold': 1})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 201:
+            raise SystemExit(f'Sale failed: {response.get_json()}')
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    pick = lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1000
+    return pick(0.5), pick(0.95), latencies[-1] * 1000, len(latencies), served[0]
+
+
+def main():
+    seed()
+    app.config['FRAGMENT_CACHE_ENABLED'] = False
+    print(f"{'scenario':<34}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'sales':>8}{'reads':>8}")
+    results = {}
+    for name, analytics, read_pool in (('writes only', False, True),
+                                       ('analytics on writer pool', True, False),
+                                       ('analytics on read pool', True, True)):
+        results[name] = run(analytics, read_pool)
+        p50, p95, worst, sales, reads = results[name]
+        print(f'{name:<34}{p50:>9.1f}{p95:>9.1f}{worst:>9.1f}{sales:>8}{reads:>8}')
+
+    stats = pool_stats(app)
+    for pool in ('write', 'read'):
+        if stats[pool]:
+            print(f"{pool} pool: size {stats[pool]['size']}, max {stats[pool]['max_connections']}, "
+                  f"peak in use {stats[pool]['peak_in_use']}, "
+                  f"{stats[pool]['queries']} queries, avg {stats[pool]['avg_query_ms']} ms")
+
+    shared, split, idle = (results[name][1] for name in
+                           ('analytics on writer pool', 'analytics on read pool', 'writes only'))
+    slowdown = results['analytics on read pool'][0] / results['writes only'][0]
+    print(f'p95 write latency under analytics: {shared / split:.1f}x lower with the read pool '
+          f'({split / idle:.1f}x idle on {os.cpu_count()} CPU(s)); p50 {slowdown:.1f}x idle')
+    if shared / split < MIN_P95_IMPROVEMENT:
+        raise SystemExit(f'FAIL: the read pool improved p95 write latency less than {MIN_P95_IMPROVEMENT}x')
+    if slowdown > MAX_P50_SLOWDOWN:
+        raise SystemExit(f'FAIL: analytics on the read pool slowed p50 writes more than {MAX_P50_SLOWDOWN}x')
+
+
+if __name__ == '__main__':
+    main()
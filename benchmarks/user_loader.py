@@ -0,0 +1,71 @@
+"""
+Benchmark: database queries per authenticated request with and without the
+cached user loader.
+
+Run from the project root:
+    python benchmarks/user_loader.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+db_path = os.path.join(tempfile.mkdtemp(), 'bench_user_loader.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import app, user_cache
+from models.database import db
+
+ROUTES = ['/api/activity-log', '/ai-insights', '/products', '/dashboard']
+REQUESTS_PER_ROUTE = 200
+
+
+def engines():
+    """The writer and, when configured, the read pool engine: GET requests read through the latter"""
+    with app.app_context():
+        pool = app.extensions.get('read_pool')
+        return [db.engine] + ([pool.engine] if pool is not None else [])
+
+
+def run(client, cached):
+    """Return {route: (queries per request, ms per request)}"""
+    results = {}
+    for route in ROUTES:
+        queries = [0]
+
+        def count(*args):
+            queries[0] += 1
+
+        for engine in engines():
+            event.listen(engine, 'before_cursor_execute', count)
+        start = time.perf_counter()
+        for _ in range(REQUESTS_PER_ROUTE):
+            if not cached:
+                user_cache.clear()
+            response = client.get(route)
+            assert response.status_code == 200, (route, response.status_code)
+        elapsed = time.perf_counter() - start
+        for engine in engines():
+            event.remove(engine, 'before_cursor_execute', count)
+        results[route] = (queries[0] / REQUESTS_PER_ROUTE, elapsed * 1000 / REQUESTS_PER_ROUTE)
+    return results
+
+
+def main():
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+
+    uncached = run(client, cached=False)
+    cached = run(client, cached=True)
+
+    print(f"{'Route':<28}{'Queries/req (uncached)':>24}{'Queries/req (cached)':>22}{'ms/req uncached':>18}{'ms/req cached':>16}")
+    for route in ROUTES:
+        print(f"{route:<28}{uncached[route][0]:>24.2f}{cached[route][0]:>22.2f}"
+              f"{uncached[route][1]:>18.3f}{cached[route][1]:>16.3f}")
+    print(f"\nCache stats: {user_cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
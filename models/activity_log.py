@@ -0,0 +1,132 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from models.database import ActivityLog, db
+
+MAX_PAGE_SIZE = 500
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def activity_log_page(user_id=None, action_type=None, affected_table=None, before=None, limit=100):
+    """
+    One page of activity logs, newest first, using keyset pagination on log_id.
+    Pass the last log_id of a page as `before` to fetch the next one. Users are
+    loaded in the same query through a join instead of one lookup per row.
+    """
+    query = ActivityLog.query.options(db.joinedload(ActivityLog.user))
+    if user_id is not None:
+        query = query.filter(ActivityLog.user_id == user_id)
+    if action_type:
+        query = query.filter(ActivityLog.action_type == action_type)
+    if affected_table:
+        query = query.filter(ActivityLog.affected_table == affected_table)
+    if before is not None:
+        query = query.filter(ActivityLog.log_id < before)
+    # SQLite reads a negative LIMIT as no limit
+    return query.order_by(ActivityLog.log_id.desc()).limit(max(1, min(limit, MAX_PAGE_SIZE))).all()
+
+
+def _archive_row(log):
+    return {
+        'log_id': log.log_id,
+        'user_id': log.user_id,
+        'action_type': log.action_type,
+        'affected_table': log.affected_table,
+        'affected_id': log.affected_id,
+        'description': log.description,
+        'timestamp': log.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def archive_activity_logs(cutoff, archive_dir, delete_only=False, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move activity logs older than cutoff out of the database.
+
+    Rows are appended, oldest first, to monthly gzip JSON-lines partitions
+    (activity_logs-YYYY-MM.jsonl.gz) and deleted only after the batch has been
+    flushed to disk. Partitions are append-only; an interrupted run can leave
+    a batch both archived and in the table, so readers dedupe on log_id (see archived_log_page).
+    Returns the number of rows removed from the table.
+    """
+    if not delete_only:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    removed = 0
+    while True:
+        batch = ActivityLog.query.filter(
+            ActivityLog.timestamp < cutoff
+        ).order_by(ActivityLog.log_id).limit(batch_size).all()
+        if not batch:
+            break
+
+        if not delete_only:
+            partitions = {}
+            for log in batch:
+                partitions.setdefault(log.timestamp.strftime('%Y-%m'), []).append(log)
+            for month, logs in partitions.items():
+                path = os.path.join(archive_dir, f'activity_logs-{month}.jsonl.gz')
+                with gzip.open(path, 'at', encoding='utf-8') as f:
+                    for log in logs:
+                        f.write(json.dumps(_archive_row(log)) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+
+        ActivityLog.query.filter(
+            ActivityLog.log_id.in_([log.log_id for log in batch])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        removed += len(batch)
+
+    return removed
+
+
+def drop_archives(archive_dir, cutoff):
+    """Delete archive partitions whose whole month ends before cutoff. Returns removed file names."""
+    if not os.path.isdir(archive_dir):
+        return []
+
+    removed = []
+    for name in sorted(os.listdir(archive_dir)):
+        if not (name.startswith('activity_logs-') and name.endswith('.jsonl.gz')):
+            continue
+        month_start = datetime.strptime(name[len('activity_logs-'):-len('.jsonl.gz')], '%Y-%m')
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        if next_month <= cutoff:
+            os.remove(os.path.join(archive_dir, name))
+            removed.append(name)
+    return removed
+
+
+def iter_archived_logs(archive_dir, month):
+    """Yield archived rows for one YYYY-MM partition"""
+    path = os.path.join(archive_dir, f'activity_logs-{month}.jsonl.gz')
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def archived_log_page(archive_dir, month, user_id=None, action_type=None, affected_table=None, after=0, limit=100):
+    """
+    Up to limit archived rows of one YYYY-MM partition with log_id above
+    `after`, oldest first. Rows archived twice by an interrupted run are
+    returned once.
+    """
+    limit = max(0, min(limit, MAX_PAGE_SIZE))
+    rows, seen = [], set()
+    for row in iter_archived_logs(archive_dir, month):
+        if len(rows) >= limit:
+            break
+        if row['log_id'] <= after or row['log_id'] in seen:
+            continue
+        if user_id is not None and row['user_id'] != user_id:
+            continue
+        if action_type and row['action_type'] != action_type:
+            continue
+        if affected_table and row['affected_table'] != affected_table:
+            continue
+        seen.add(row['log_id'])
+        rows.append(row)
+    return rows
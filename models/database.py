@@ -2,8 +2,11 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.schema import CreateTable
+from models.read_pool import ReadWriteSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': ReadWriteSession})
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -40,12 +43,12 @@ class ActivityLog(db.Model):
     __tablename__ = 'activity_logs'
     
     log_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
-    action_type = db.Column(db.String(100), nullable=False)
-    affected_table = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False, index=True)
+    action_type = db.Column(db.String(100), nullable=False, index=True)
+    affected_table = db.Column(db.String(100), nullable=False, index=True)
     affected_id = db.Column(db.Integer, nullable=True)
     description = db.Column(db.String(500), nullable=True)
-    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     
     def to_dict(self):
         return {
@@ -63,14 +66,19 @@ class Product(db.Model):
     __tablename__ = 'products'
     
     product_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    product_name = db.Column(db.String(200), nullable=False)
-    category = db.Column(db.String(100), nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    product_name = db.Column(db.String(200), nullable=False, index=True)
+    category = db.Column(db.String(100), nullable=False, index=True)
+    price = db.Column(db.Float, nullable=False, index=True)
     
     # Relationships
-    inventory = db.relationship('Inventory', backref='product', lazy=True, cascade='all, delete-orphan')
-    sales = db.relationship('Sale', backref='product', lazy=True, cascade='all, delete-orphan')
-    purchases = db.relationship('Purchase', backref='product', lazy=True, cascade='all, delete-orphan')
+    # Child rows are removed by ON DELETE CASCADE in the database, not loaded and deleted one by one
+    inventory = db.relationship('Inventory', backref='product', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    sales = db.relationship('Sale', backref='product', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    purchases = db.relationship('Purchase', backref='product', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    forecast_accuracy = db.relationship('ForecastAccuracy', backref='product', lazy=True, cascade='all, delete-orphan',
+                                        passive_deletes=True)
+    order_lines = db.relationship('PurchaseOrderLine', backref='product', lazy=True, cascade='all, delete-orphan',
+                                  passive_deletes=True)
     
     def to_dict(self):
         return {
@@ -88,7 +96,9 @@ class Supplier(db.Model):
     contact_info = db.Column(db.String(200), nullable=False)
     
     # Relationships
-    purchases = db.relationship('Purchase', backref='supplier', lazy=True, cascade='all, delete-orphan')
+    purchases = db.relationship('Purchase', backref='supplier', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    purchase_orders = db.relationship('PurchaseOrder', backref='supplier', lazy=True, cascade='all, delete-orphan',
+                                      passive_deletes=True)
     
     def to_dict(self):
         return {
@@ -101,9 +111,9 @@ class Inventory(db.Model):
     __tablename__ = 'inventory'
     
     inventory_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
-    stock_quantity = db.Column(db.Integer, nullable=False, default=0)
-    restock_date = db.Column(db.Date, nullable=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id', ondelete='CASCADE'), nullable=False, index=True)
+    stock_quantity = db.Column(db.Integer, nullable=False, default=0, index=True)
+    restock_date = db.Column(db.Date, nullable=True, index=True)
     
     def to_dict(self):
         return {
@@ -116,11 +126,12 @@ class Inventory(db.Model):
 
 class Sale(db.Model):
     __tablename__ = 'sales'
+    __table_args__ = (db.Index('ix_sales_product_id_sale_date', 'product_id', 'sale_date'),)
     
     sale_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id', ondelete='CASCADE'), nullable=False)
     quantity_sold = db.Column(db.Integer, nullable=False)
-    sale_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
+    sale_date = db.Column(db.Date, nullable=False, default=datetime.utcnow, index=True)
     
     def to_dict(self):
         return {
@@ -135,10 +146,10 @@ class Purchase(db.Model):
     __tablename__ = 'purchases'
     
     purchase_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
-    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.supplier_id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id', ondelete='CASCADE'), nullable=False, index=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.supplier_id', ondelete='CASCADE'), nullable=False, index=True)
     quantity_purchased = db.Column(db.Integer, nullable=False)
-    purchase_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
+    purchase_date = db.Column(db.Date, nullable=False, default=datetime.utcnow, index=True)
     
     def to_dict(self):
         return {
@@ -151,11 +162,209 @@ class Purchase(db.Model):
             'purchase_date': self.purchase_date.strftime('%Y-%m-%d') if self.purchase_date else None
         }
 
+class ForecastAccuracy(db.Model):
+    __tablename__ = 'forecast_accuracy'
+    __table_args__ = (db.UniqueConstraint('product_id', 'model'),)
+    
+    accuracy_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id', ondelete='CASCADE'), nullable=False)
+    model = db.Column(db.String(50), nullable=False)
+    horizon_days = db.Column(db.Integer, nullable=False)
+    origins = db.Column(db.Integer, nullable=False)
+    mae = db.Column(db.Float, nullable=False)
+    mape = db.Column(db.Float, nullable=True)
+    stockout_alerts = db.Column(db.Integer, nullable=False, default=0)
+    stockout_hits = db.Column(db.Integer, nullable=False, default=0)
+    evaluated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    @property
+    def stockout_hit_rate(self):
+        return self.stockout_hits / self.stockout_alerts if self.stockout_alerts else None
+    
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'model': self.model,
+            'horizon_days': self.horizon_days,
+            'origins': self.origins,
+            'mae': round(self.mae, 3),
+            'mape': round(self.mape, 3) if self.mape is not None else None,
+            'stockout_alerts': self.stockout_alerts,
+            'stockout_hits': self.stockout_hits,
+            'stockout_hit_rate': round(self.stockout_hit_rate, 3) if self.stockout_hit_rate is not None else None,
+            'evaluated_at': self.evaluated_at.strftime('%Y-%m-%d %H:%M:%S') if self.evaluated_at else None
+        }
+
+class PurchaseOrder(db.Model):
+    __tablename__ = 'purchase_orders'
+    
+    order_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.supplier_id', ondelete='CASCADE'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='open', index=True)  # open, received
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expected_date = db.Column(db.Date, nullable=True)
+    
+    # Relationships
+    lines = db.relationship('PurchaseOrderLine', backref='order', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    
+    def to_dict(self):
+        return {
+            'order_id': self.order_id,
+            'supplier_id': self.supplier_id,
+            'supplier_name': self.supplier.supplier_name if self.supplier else None,
+            'status': self.status,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'expected_date': self.expected_date.strftime('%Y-%m-%d') if self.expected_date else None,
+            'lines': [line.to_dict() for line in self.lines]
+        }
+
+class PurchaseOrderLine(db.Model):
+    __tablename__ = 'purchase_order_lines'
+    
+    line_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('purchase_orders.order_id', ondelete='CASCADE'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id', ondelete='CASCADE'), nullable=False, index=True)
+    quantity_ordered = db.Column(db.Integer, nullable=False)
+    quantity_received = db.Column(db.Integer, nullable=False, default=0)
+    received_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'line_id': self.line_id,
+            'product_id': self.product_id,
+            'product_name': self.product.product_name if self.product else None,
+            'quantity_ordered': self.quantity_ordered,
+            'quantity_received': self.quantity_received,
+            'received_at': self.received_at.strftime('%Y-%m-%d %H:%M:%S') if self.received_at else None
+        }
+
+class StockMovement(db.Model):
+    __tablename__ = 'stock_movements'
+    __table_args__ = (db.Index('ix_stock_movements_product_id_movement_id', 'product_id', 'movement_id'),)
+    
+    movement_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    quantity_change = db.Column(db.Integer, nullable=False)
+    stock_after = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(50), nullable=False)
+    reference_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'movement_id': self.movement_id,
+            'product_id': self.product_id,
+            'quantity_change': self.quantity_change,
+            'stock_after': self.stock_after,
+            'reason': self.reason,
+            'reference_id': self.reference_id,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
+
+class StockSnapshot(db.Model):
+    __tablename__ = 'stock_snapshots'
+    __table_args__ = (db.Index('ix_stock_snapshots_product_id_taken_at', 'product_id', 'taken_at'),)
+    
+    snapshot_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    stock_quantity = db.Column(db.Integer, nullable=False)
+    last_movement_id = db.Column(db.Integer, nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ReorderPoint(db.Model):
+    __tablename__ = 'reorder_points'
+    
+    # Computed by the reorder engine; products without a row use the default threshold
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id', ondelete='CASCADE'), primary_key=True)
+    reorder_point = db.Column(db.Float, nullable=False)
+    model = db.Column(db.String(50), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class StockIndexGeneration(db.Model):
+    __tablename__ = 'stock_index_generation'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+class Location(db.Model):
+    __tablename__ = 'locations'
+    
+    location_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(200), unique=True, nullable=False)
+    location_type = db.Column(db.String(50), nullable=False, default='store')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'location_id': self.location_id,
+            'name': self.name,
+            'location_type': self.location_type,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
+
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys (and ON DELETE CASCADE) when asked to, per connection
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+def _rebuild_for_cascade():
+    """
+    Recreate tables created before their foreign keys declared ON DELETE
+    CASCADE. SQLite cannot alter a constraint, so the table is copied into a
+    new one with the current definition and swapped in.
+    """
+    with db.engine.connect() as conn:
+        stale = []
+        for table in db.metadata.sorted_tables:
+            declared = {fk.parent.name for fk in table.foreign_keys if fk.ondelete == 'CASCADE'}
+            existing = conn.exec_driver_sql(f'PRAGMA foreign_key_list("{table.name}")').fetchall()
+            # (id, seq, table, from, to, on_update, on_delete, match)
+            if any(row[3] in declared and row[6] != 'CASCADE' for row in existing):
+                stale.append(table)
+        if not stale:
+            return
+        
+        # Foreign keys are switched off (outside a transaction, or SQLite ignores it)
+        # so dropping the old tables does not cascade; the swap itself is one transaction
+        conn.commit()
+        conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        try:
+            conn.exec_driver_sql('BEGIN')
+            for table in stale:
+                columns = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+                copied = ', '.join(f'"{c.name}"' for c in table.columns if c.name in columns)
+                ddl = str(CreateTable(table).compile(dialect=db.engine.dialect))
+                conn.exec_driver_sql(ddl.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {table.name}_rebuild ', 1))
+                conn.exec_driver_sql(f'INSERT INTO {table.name}_rebuild ({copied}) SELECT {copied} FROM {table.name}')
+                conn.exec_driver_sql(f'DROP TABLE {table.name}')
+                conn.exec_driver_sql(f'ALTER TABLE {table.name}_rebuild RENAME TO {table.name}')
+            orphans = [row for table in stale
+                       for row in conn.exec_driver_sql(f'PRAGMA foreign_key_check("{table.name}")').fetchall()]
+            if orphans:
+                raise RuntimeError(f'Rows reference missing parents after rebuilding for ON DELETE CASCADE: {orphans[:5]}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+            conn.commit()
+
 def init_db(app):
     """Initialize the database with sample data"""
     db.init_app(app)
     with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _enable_foreign_keys)
         db.create_all()
+        if db.engine.dialect.name == 'sqlite':
+            _rebuild_for_cascade()
+        
+        # create_all skips existing tables, so add any indexes declared since
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
         
         # Create default admin user if none exists
         if User.query.count() == 0:
@@ -0,0 +1,162 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from flask import current_app
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models.database import db
+
+# Rendered template fragments keyed by the versions of the tables they read.
+#
+# Every committed ORM write (including bulk db.insert/update/delete through
+# the session) bumps a per-table counter in this process, so a fragment is
+# re-rendered only after one of its tables changed. Other processes' writes
+# are picked up when the entry's TTL runs out. Deletes also bump the tables
+# the database cascades them to. Writes made with raw SQL text are not tracked.
+
+CHANGED_TABLES = 'fragment_cache_changed_tables'
+
+
+class TableVersions:
+    """Per-table write counters, bumped when a transaction that wrote the table commits"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = Lock()
+
+    def get(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+
+class FragmentCache:
+    """LRU cache of rendered fragments bounded by total size, with a time-to-live per entry"""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl=60):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, monotonic() + self.ttl)
+            self._size += len(value)
+            # Entries keyed by old table versions are never read again and age out here
+            while self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        value, _ = self._entries.pop(key)
+        self._size -= len(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes,
+                    'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+
+table_versions = TableVersions()
+fragment_cache = FragmentCache()
+
+
+def cached_fragment(name, tables, render, per_user=False, vary=None):
+    """
+    Output of render() (a string, usually a rendered template) cached under
+    name and the current versions of `tables`. per_user keeps one copy per
+    logged-in user; vary is anything else the output depends on, such as the
+    query string. Returns Markup so it can be placed in a template as is.
+    """
+    if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+        return Markup(render())
+
+    key = (name, table_versions.get(tables), current_user.get_id() if per_user else None, vary)
+    value = fragment_cache.get(key)
+    if value is None:
+        value = render()
+        fragment_cache.set(key, value)
+    return Markup(value)
+
+
+def _changed_tables(session):
+    return session.info.setdefault(CHANGED_TABLES, set())
+
+
+def cascaded_tables(name):
+    """name plus every table whose rows ON DELETE CASCADE removes when a row of name is deleted"""
+    tables, pending = {name}, [name]
+    while pending:
+        parent = pending.pop()
+        for table in db.metadata.sorted_tables:
+            if table.name not in tables and any(
+                fk.ondelete == 'CASCADE' and fk.column.table.name == parent for fk in table.foreign_keys
+            ):
+                tables.add(table.name)
+                pending.append(table.name)
+    return tables
+
+
+@event.listens_for(db.Model, 'after_insert', propagate=True)
+@event.listens_for(db.Model, 'after_update', propagate=True)
+def _track_row_write(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _changed_tables(session).add(mapper.local_table.name)
+
+
+@event.listens_for(db.Model, 'after_delete', propagate=True)
+def _track_row_delete(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _changed_tables(session).update(cascaded_tables(mapper.local_table.name))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and hasattr(table, 'name'):
+            tables = cascaded_tables(table.name) if orm_execute_state.is_delete else {table.name}
+            _changed_tables(orm_execute_state.session).update(tables)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_versions(session):
+    tables = session.info.pop(CHANGED_TABLES, None)
+    if tables:
+        table_versions.bump(tables)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(CHANGED_TABLES, None)
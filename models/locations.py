@@ -0,0 +1,284 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import Column, Date, DateTime, Index, Integer, MetaData, Table, create_engine, event, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models.database import Product
+
+# Per-location shards.
+#
+# Products, suppliers, users and the location catalog stay in the main
+# database. Each location's stock, sales and purchases live in a SQLite file of
+# their own (LOCATION_SHARD_DIR/location_<id>.db), so locations never wait on
+# each other's writer lock. Writes are routed to a single shard in one
+# transaction; cross-location reads fan out to every shard on a thread pool and
+# are merged here.
+#
+# Location stock is separate from the central inventory: location sales and
+# purchases do not change Inventory, the stock ledger, forecasts or reports.
+# Deleting products or suppliers purges their rows from every shard.
+
+FANOUT_WORKERS = 8
+PURGE_CHUNK = 500
+LOCATION_SCOPE_NOTE = ('Location stock, sales and purchases are kept per location only; they do not change '
+                       'central inventory, the stock ledger, forecasts or reports.')
+
+shard_metadata = MetaData()
+
+location_stock = Table(
+    'location_stock', shard_metadata,
+    Column('product_id', Integer, primary_key=True),
+    Column('stock_quantity', Integer, nullable=False, default=0),
+    Column('restock_date', Date, nullable=True),
+    Column('updated_at', DateTime, nullable=False, default=datetime.utcnow),
+)
+
+location_sales = Table(
+    'location_sales', shard_metadata,
+    Column('sale_id', Integer, primary_key=True, autoincrement=True),
+    Column('product_id', Integer, nullable=False),
+    Column('quantity_sold', Integer, nullable=False),
+    Column('sale_date', Date, nullable=False, index=True),
+    Column('created_at', DateTime, nullable=False, default=datetime.utcnow),
+    Index('ix_location_sales_product_id_sale_date', 'product_id', 'sale_date'),
+)
+
+location_purchases = Table(
+    'location_purchases', shard_metadata,
+    Column('purchase_id', Integer, primary_key=True, autoincrement=True),
+    Column('product_id', Integer, nullable=False),
+    Column('supplier_id', Integer, nullable=False),
+    Column('quantity_purchased', Integer, nullable=False),
+    Column('purchase_date', Date, nullable=False, index=True),
+    Column('created_at', DateTime, nullable=False, default=datetime.utcnow),
+)
+
+_engines = {}
+_engines_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='location-shard')
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    # WAL lets fan-out reads run while the location is being written to
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.close()
+
+
+def shard_uri(location):
+    # Always under LOCATION_SHARD_DIR and named by id, never taken from a client
+    path = os.path.join(current_app.config['LOCATION_SHARD_DIR'], f'location_{location.location_id}.db')
+    return f'sqlite:///{path}'
+
+
+def shard_engine(uri):
+    """Engine for one shard, creating the file and its schema on first use"""
+    with _engines_lock:
+        engine = _engines.get(uri)
+        if engine is None:
+            if uri.startswith('sqlite:///') and uri != 'sqlite:///:memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(uri[len('sqlite:///'):])), exist_ok=True)
+            engine = create_engine(uri)
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _configure_sqlite)
+            shard_metadata.create_all(engine)
+            _engines[uri] = engine
+    return engine
+
+
+def shard_for(location):
+    """Route to the shard that owns a location's stock, sales and purchases"""
+    return shard_engine(shard_uri(location))
+
+
+# ============= WRITES (single shard) =============
+
+def _upsert_stock(conn, product_id, values, increment=False):
+    """Insert or update a location_stock row; returns the resulting stock level"""
+    now = datetime.utcnow()
+    stmt = sqlite_insert(location_stock).values(product_id=product_id, updated_at=now, **values)
+    updates = {name: getattr(stmt.excluded, name) for name in values}
+    if increment:
+        updates['stock_quantity'] = location_stock.c.stock_quantity + stmt.excluded.stock_quantity
+    updates['updated_at'] = now
+    conn.execute(stmt.on_conflict_do_update(index_elements=['product_id'], set_=updates))
+    return conn.execute(
+        select(location_stock.c.stock_quantity).where(location_stock.c.product_id == product_id)
+    ).scalar()
+
+
+def set_location_stock(location, product_id, stock_quantity, restock_date=None):
+    """Set a product's stock at a location. Returns the new stock level."""
+    values = {'stock_quantity': stock_quantity}
+    if restock_date is not None:
+        values['restock_date'] = restock_date
+    with shard_for(location).begin() as conn:
+        return _upsert_stock(conn, product_id, values)
+
+
+def record_location_sale(location, product_id, quantity_sold, sale_date):
+    """
+    Record a sale at a location and take it out of that location's stock in
+    one shard transaction. Raises ValueError when the location is short.
+    """
+    with shard_for(location).begin() as conn:
+        updated = conn.execute(
+            location_stock.update()
+            .where(location_stock.c.product_id == product_id,
+                   location_stock.c.stock_quantity >= quantity_sold)
+            .values(stock_quantity=location_stock.c.stock_quantity - quantity_sold,
+                    updated_at=datetime.utcnow())
+        )
+        if updated.rowcount == 0:
+            available = conn.execute(
+                select(location_stock.c.stock_quantity).where(location_stock.c.product_id == product_id)
+            ).scalar() or 0
+            raise ValueError(f'Insufficient stock at {location.name}. Available: {available}')
+        result = conn.execute(location_sales.insert().values(
+            product_id=product_id, quantity_sold=quantity_sold, sale_date=sale_date
+        ))
+    return {
+        'sale_id': result.inserted_primary_key[0],
+        'location_id': location.location_id,
+        'product_id': product_id,
+        'quantity_sold': quantity_sold,
+        'sale_date': sale_date.strftime('%Y-%m-%d')
+    }
+
+
+def record_location_purchase(location, product_id, supplier_id, quantity_purchased, purchase_date):
+    """Record a purchase received at a location and add it to that location's stock"""
+    with shard_for(location).begin() as conn:
+        result = conn.execute(location_purchases.insert().values(
+            product_id=product_id, supplier_id=supplier_id,
+            quantity_purchased=quantity_purchased, purchase_date=purchase_date
+        ))
+        _upsert_stock(conn, product_id,
+                      {'stock_quantity': quantity_purchased, 'restock_date': purchase_date}, increment=True)
+    return {
+        'purchase_id': result.inserted_primary_key[0],
+        'location_id': location.location_id,
+        'product_id': product_id,
+        'supplier_id': supplier_id,
+        'quantity_purchased': quantity_purchased,
+        'purchase_date': purchase_date.strftime('%Y-%m-%d')
+    }
+
+
+def purge_location_rows(locations, product_ids=(), supplier_ids=()):
+    """
+    Delete the stock, sales and purchases of deleted products, and the purchases
+    of deleted suppliers, from every location's shard in parallel. Shards have
+    no foreign keys to the main database, so this is the cascade for them.
+    Returns the number of rows removed.
+    """
+    product_ids, supplier_ids = list(product_ids), list(supplier_ids)
+    statements = []
+    for start in range(0, len(product_ids), PURGE_CHUNK):
+        chunk = product_ids[start:start + PURGE_CHUNK]
+        statements += [table.delete().where(table.c.product_id.in_(chunk))
+                       for table in (location_stock, location_sales, location_purchases)]
+    for start in range(0, len(supplier_ids), PURGE_CHUNK):
+        chunk = supplier_ids[start:start + PURGE_CHUNK]
+        statements.append(location_purchases.delete().where(location_purchases.c.supplier_id.in_(chunk)))
+    if not statements or not locations:
+        return 0
+
+    def run(engine):
+        with engine.begin() as conn:
+            return sum(conn.execute(statement).rowcount for statement in statements)
+
+    return sum(_pool.map(run, [shard_for(location) for location in locations]))
+
+
+# ============= READS (fan-out) =============
+
+def _fan_out(query, locations):
+    """Run query on every location's shard in parallel. Returns [(location, rows)]."""
+    # Resolve engines here: shard paths come from the app config
+    targets = [(location, shard_for(location)) for location in locations]
+
+    def run(target):
+        location, engine = target
+        with engine.connect() as conn:
+            return location, conn.execute(query).all()
+
+    return list(_pool.map(run, targets))
+
+
+def _product_names(product_ids):
+    if not product_ids:
+        return {}
+    rows = Product.query.with_entities(Product.product_id, Product.product_name) \
+        .filter(Product.product_id.in_(product_ids)).all()
+    return dict(rows)
+
+
+def location_inventory(location):
+    """Stock of every product held at one location"""
+    query = select(location_stock).order_by(location_stock.c.product_id)
+    with shard_for(location).connect() as conn:
+        rows = conn.execute(query).all()
+    names = _product_names([row.product_id for row in rows])
+    return [
+        {
+            'location_id': location.location_id,
+            'product_id': row.product_id,
+            'product_name': names.get(row.product_id),
+            'stock_quantity': row.stock_quantity,
+            'restock_date': row.restock_date.strftime('%Y-%m-%d') if row.restock_date else None
+        }
+        for row in rows
+    ]
+
+
+def stock_across_locations(locations, product_ids=None):
+    """Total stock per product over locations, with the per-location breakdown"""
+    query = select(location_stock.c.product_id, location_stock.c.stock_quantity)
+    if product_ids:
+        query = query.where(location_stock.c.product_id.in_(product_ids))
+
+    totals = {}
+    for location, rows in _fan_out(query, locations):
+        for product_id, stock_quantity in rows:
+            entry = totals.setdefault(product_id, {'product_id': product_id, 'total_stock': 0, 'locations': []})
+            entry['total_stock'] += stock_quantity
+            entry['locations'].append({'location_id': location.location_id, 'stock_quantity': stock_quantity})
+
+    names = _product_names(list(totals))
+    items = [totals[product_id] for product_id in sorted(totals)]
+    for item in items:
+        item['product_name'] = names.get(item['product_id'])
+    return items
+
+
+def sales_across_locations(locations, start_date=None, end_date=None):
+    """Units sold and sale count per product over locations, each shard aggregating its own rows"""
+    query = select(
+        location_sales.c.product_id,
+        func.sum(location_sales.c.quantity_sold),
+        func.count(location_sales.c.sale_id)
+    ).group_by(location_sales.c.product_id)
+    if start_date is not None:
+        query = query.where(location_sales.c.sale_date >= start_date)
+    if end_date is not None:
+        query = query.where(location_sales.c.sale_date <= end_date)
+
+    totals = {}
+    for location, rows in _fan_out(query, locations):
+        for product_id, quantity, count in rows:
+            entry = totals.setdefault(product_id, {
+                'product_id': product_id, 'total_sold': 0, 'sale_count': 0, 'locations': []
+            })
+            entry['total_sold'] += quantity
+            entry['sale_count'] += count
+            entry['locations'].append({'location_id': location.location_id, 'quantity_sold': quantity})
+
+    names = _product_names(list(totals))
+    items = sorted(totals.values(), key=lambda item: item['total_sold'], reverse=True)
+    for item in items:
+        item['product_name'] = names.get(item['product_id'])
+    return items
@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import date, datetime
+import sqlalchemy as sa
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def encode_cursor(value, key):
+    """Opaque URL-safe token for a (sort value, primary key) position"""
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    raw = json.dumps([value, key], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, column):
+    """(sort value, primary key) from encode_cursor(), or None if token is not a valid cursor"""
+    if not token:
+        return None
+    try:
+        value, key = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        python_type = column.type.python_type
+        if value is not None and python_type in (date, datetime):
+            value = python_type.fromisoformat(value)
+        return value, int(key)
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def _after(column, key, value, key_value):
+    """Rows after (value, key_value) in ascending order (SQLite sorts NULLs first)"""
+    if column is key:
+        return key > key_value
+    if value is None:
+        return sa.or_(column.is_not(None), sa.and_(column.is_(None), key > key_value))
+    # The outer bound on column lets SQLite seek its index instead of scanning
+    return sa.and_(column >= value, sa.or_(column > value, key > key_value))
+
+
+def _before(column, key, value, key_value):
+    """Rows before (value, key_value) in ascending order"""
+    if column is key:
+        return key < key_value
+    if value is None:
+        return sa.and_(column.is_(None), key < key_value)
+    before = sa.and_(column <= value, sa.or_(column < value, key < key_value))
+    return sa.or_(before, column.is_(None)) if column.expression.nullable else before
+
+
+class Page:
+    """
+    One page of a list query, using keyset (seek) pagination on the sort column
+    plus the primary key as a tiebreaker. Pages are addressed by the position of
+    the row before them (after=) or after them (before=) instead of an offset,
+    so a deep page costs the same as the first one. Fetches per_page + 1 rows
+    to find out whether there is another page instead of counting the table.
+    """
+
+    def __init__(self, query, column, key, direction='asc', after=None, before=None, per_page=DEFAULT_PER_PAGE,
+                 number=1):
+        self.per_page = max(1, min(per_page, MAX_PER_PAGE))
+        after = decode_cursor(after, column)
+        before = None if after else decode_cursor(before, column)
+        self.page = max(number, 1) if after or before else 1
+
+        # Walking backwards (before=) reads in reverse order and flips the rows
+        backwards = before is not None
+        ascending = (direction == 'asc') != backwards
+        if after or before:
+            value, key_value = after or before
+            query = query.filter((_after if ascending else _before)(column, key, value, key_value))
+        if ascending:
+            query = query.order_by(column.asc(), key.asc())
+        else:
+            query = query.order_by(column.desc(), key.desc())
+
+        rows = query.add_columns(column, key).limit(self.per_page + 1).all()
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        self.items = [row[0] if len(row) == 3 else tuple(row[:-2]) for row in rows]
+        self.has_prev = more if backwards else after is not None
+        self.has_next = more if not backwards else True
+        self.next_cursor = encode_cursor(*rows[-1][-2:]) if rows and self.has_next else None
+        self.prev_cursor = encode_cursor(*rows[0][-2:]) if rows and self.has_prev else None
@@ -0,0 +1,193 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+import sqlalchemy as sa
+from flask import current_app, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+# Read/write split on one SQLite database.
+#
+# GET requests and functions wrapped in read_only() send their SELECTs to a
+# separate pool of query_only connections on the same file, so analytics
+# reads do not hold the connections POS writes need. The database runs in WAL
+# mode, so readers and the writer do not block each other. Flushes, DML and
+# anything else still go to the writer pool, so a GET that writes keeps working.
+# Reads inside a write request stay on the writer and see its own changes, and
+# so do reads after a GET's first flush or DML: the session is pinned to the
+# writer until its transaction ends, because the read pool cannot see
+# uncommitted rows.
+#
+# The read pool has no overflow by default and is sized to the CPU count, so
+# analytics queue for a read connection instead of starving the writer of CPU.
+
+READ_METHODS = ('GET', 'HEAD')
+PINNED_TO_WRITER = 'pinned_to_writer'  # session.info key set once the transaction has written
+
+_read_only = ContextVar('read_only', default=False)
+
+
+@contextmanager
+def read_only():
+    """Route SELECTs to the read pool inside this block (also usable as @read_only())"""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def _is_read(clause):
+    if clause is None:
+        return False
+    if getattr(clause, 'is_select', False):
+        return True
+    # db.text() statements
+    text = getattr(clause, 'text', None)
+    return isinstance(text, str) and text.lstrip()[:6].upper() in ('SELECT', 'WITH')
+
+
+class ReadWriteSession(Session):
+    """Flask-SQLAlchemy session that sends reads to the read pool when one is configured"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not self.info.get(PINNED_TO_WRITER) and _is_read(clause)
+                and has_app_context()):
+            pool = current_app.extensions.get('read_pool')
+            if pool is not None and current_app.config.get('READ_POOL_ENABLED', True) and (
+                _read_only.get() or has_request_context() and request.method in READ_METHODS
+            ):
+                return pool.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@sa.event.listens_for(ReadWriteSession, 'after_flush')
+def _pin_after_flush(session, flush_context):
+    session.info[PINNED_TO_WRITER] = True
+
+
+@sa.event.listens_for(ReadWriteSession, 'do_orm_execute')
+def _pin_after_dml(orm_execute_state):
+    if not _is_read(orm_execute_state.statement):
+        orm_execute_state.session.info[PINNED_TO_WRITER] = True
+
+
+@sa.event.listens_for(ReadWriteSession, 'after_transaction_end')
+def _unpin(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(PINNED_TO_WRITER, None)
+
+
+class PoolMetrics:
+    """Checkouts, connections in use and statement timings for one engine"""
+
+    def __init__(self, engine, name, max_connections=None):
+        self.engine = engine
+        self.name = name
+        self.max_connections = max_connections
+        self.checkouts = 0
+        self.peak_in_use = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.slowest_query = 0.0
+        self._in_use = 0
+        self._lock = threading.Lock()
+        sa.event.listen(engine, 'checkout', self._checkout)
+        sa.event.listen(engine, 'checkin', self._checkin)
+        sa.event.listen(engine, 'before_cursor_execute', self._before_execute)
+        sa.event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self._in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+
+    def _checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._in_use = max(self._in_use - 1, 0)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info['query_started'].pop()
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += elapsed
+            self.slowest_query = max(self.slowest_query, elapsed)
+
+    def stats(self):
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                'pool': self.name,
+                'size': pool.size() if hasattr(pool, 'size') else None,
+                'max_connections': self.max_connections,
+                'in_use': self._in_use,
+                'peak_in_use': self.peak_in_use,
+                'checkouts': self.checkouts,
+                'queries': self.queries,
+                'avg_query_ms': round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0.0,
+                'slowest_query_ms': round(self.slowest_query * 1000, 3)
+            }
+
+
+class ReadPool:
+    """query_only engine on the application's SQLite file"""
+
+    def __init__(self, engine, max_connections=None):
+        self.engine = engine
+        self.metrics = PoolMetrics(engine, 'read', max_connections)
+
+
+def pool_options(uri, size, overflow, timeout):
+    """create_engine pool arguments for uri (none for in-memory SQLite, which cannot be pooled)"""
+    url = sa.engine.make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    return {'pool_size': size, 'max_overflow': overflow, 'pool_timeout': timeout}
+
+
+def _max_connections(options):
+    return options['pool_size'] + options['max_overflow'] if 'pool_size' in options else None
+
+
+def _query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA query_only=ON')
+    cursor.close()
+
+
+def init_read_pool(app, db):
+    """
+    Create the read pool for a file-backed SQLite database and switch the file
+    to WAL mode. Metrics are kept for both pools; other databases only get
+    writer metrics.
+    """
+    with app.app_context():
+        writer = db.engine
+        app.extensions['write_pool_metrics'] = PoolMetrics(
+            writer, 'write', _max_connections(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})))
+        options = pool_options(writer.url, app.config['READ_POOL_SIZE'], app.config['READ_POOL_OVERFLOW'],
+                               app.config['POOL_TIMEOUT'])
+        if writer.dialect.name != 'sqlite' or not options:
+            return None
+
+        with writer.connect() as conn:
+            conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+        engine = sa.create_engine(writer.url, **options)
+        sa.event.listen(engine, 'connect', _query_only)
+        pool = ReadPool(engine, _max_connections(options))
+        app.extensions['read_pool'] = pool
+        return pool
+
+
+def pool_stats(app):
+    """Metrics of the writer and (when configured) read pools"""
+    stats = {'write': app.extensions['write_pool_metrics'].stats(), 'read': None}
+    pool = app.extensions.get('read_pool')
+    if pool is not None:
+        stats['read'] = pool.metrics.stats()
+    stats['read_pool_enabled'] = pool is not None and app.config.get('READ_POOL_ENABLED', True)
+    return stats
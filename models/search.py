@@ -0,0 +1,113 @@
+import re
+from models.database import Product, db
+
+MAX_SEARCH_RESULTS = 100
+
+# FTS5 'rank' for products_fts: name matches weigh ten times category matches
+RANK_FUNCTION = 'bm25(10.0, 1.0)'
+
+# External-content FTS5 index over products, kept in sync by triggers so every
+# insert, update and delete on products (ORM or bulk) is reflected immediately.
+# prefix='2 3' adds prefix indexes that keep short type-ahead queries fast.
+_FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        product_name, category,
+        content='products', content_rowid='product_id',
+        prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, product_name, category)
+        VALUES (new.product_id, new.product_name, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, product_name, category)
+        VALUES ('delete', old.product_id, old.product_name, old.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF product_name, category ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, product_name, category)
+        VALUES ('delete', old.product_id, old.product_name, old.category);
+        INSERT INTO products_fts(rowid, product_name, category)
+        VALUES (new.product_id, new.product_name, new.category);
+    END""",
+]
+
+
+def fts_available():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def init_product_search():
+    """Create the products FTS5 index and its triggers, building it on first run"""
+    if not fts_available():
+        return
+    exists = db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    )).first()
+    for statement in _FTS_SCHEMA:
+        db.session.execute(db.text(statement))
+    if not exists:
+        db.session.execute(db.text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    # Persistent, so ORDER BY rank sorts by it inside the index
+    db.session.execute(db.text("INSERT INTO products_fts(products_fts, rank) VALUES ('rank', :rank)"),
+                       {'rank': RANK_FUNCTION})
+    db.session.commit()
+
+
+def _match_expression(query):
+    """Turn free text into an FTS5 query where every term is a prefix match"""
+    terms = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def product_match_clause(query):
+    """
+    Filter clause restricting products to those matching query, for use in list
+    pages. Uses the FTS index when available and a name prefix match otherwise.
+    Returns None for an empty query.
+    """
+    match = _match_expression(query or '')
+    if not match:
+        return None
+    if not fts_available():
+        return Product.product_name.ilike(f'{query.strip()}%')
+    return db.text(
+        "products.product_id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH :product_match)"
+    ).bindparams(product_match=match)
+
+
+def search_products(query, limit=20, category=None):
+    """
+    Ranked prefix search over product name and category.
+    Name matches weigh more than category matches; every match is ranked
+    by the index before the limit is applied.
+    """
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+    match = _match_expression(query or '')
+    if not match:
+        return []
+
+    if not fts_available():
+        products = Product.query.filter(Product.product_name.ilike(f'{query.strip()}%'))
+        if category:
+            products = products.filter(Product.category == category)
+        return [p.to_dict() for p in products.order_by(Product.product_name).limit(limit)]
+
+    if category:
+        # Narrow inside the index so only this category's matches are ranked
+        phrase = ' '.join(re.findall(r'\w+', category.lower()))
+        if phrase:
+            match = f'({match}) AND {{category}}: "{phrase}"'
+
+    sql = """
+        SELECT p.product_id, p.product_name, p.category, p.price
+        FROM products_fts
+        JOIN products p ON p.product_id = products_fts.rowid
+        WHERE products_fts MATCH :match
+    """
+    params = {'match': match, 'limit': limit}
+    if category:
+        sql += " AND p.category = :category"
+        params['category'] = category
+    sql += " ORDER BY products_fts.rank LIMIT :limit"
+
+    return [dict(row._mapping) for row in db.session.execute(db.text(sql), params)]
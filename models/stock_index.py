@@ -0,0 +1,246 @@
+import threading
+from time import monotonic
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models.database import Inventory, Product, ReorderPoint, StockIndexGeneration, db
+
+# Process-local stock index.
+#
+# product_id -> inventory_id, stock, reorder point and restock date held in
+# sorted NumPy arrays, so stock checks and low-stock listings never touch the
+# database or build ORM objects. Committed Inventory writes are applied to the
+# arrays as they happen (write-through). Every transaction that writes
+# inventory also bumps stock_index_generation; when the stored generation is
+# not the one this process last applied, another process has written and the
+# index is reloaded from the table. Reorder points come from reorder_points;
+# writing that table bumps the generation too, so every process reloads them.
+
+LOW_STOCK_THRESHOLD = 20  # Default reorder point, the dashboard's low stock cut-off
+NO_DATE = -1
+
+PENDING = 'stock_index_pending'
+GENERATION_RANGE = 'stock_index_generations'
+STALE = 'stock_index_stale'
+
+
+def _epoch_day(value):
+    return NO_DATE if value is None else int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def _current_generation():
+    return db.session.query(StockIndexGeneration.generation).filter_by(id=1).scalar()
+
+
+class StockIndex:
+    """Array-backed product_id -> stock index, resynced by generation"""
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval  # Seconds between generation checks
+        self.generation = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._product_ids = np.zeros(0, dtype=np.int64)
+        self._inventory_ids = np.zeros(0, dtype=np.int64)
+        self._stock = np.zeros(0, dtype=np.int64)
+        self._restock_days = np.zeros(0, dtype=np.int32)
+        self._reorder_points = np.zeros(0, dtype=np.float64)
+
+    def load(self):
+        """Rebuild the index from the inventory table in one query"""
+        if db.session.get(StockIndexGeneration, 1) is None:
+            db.session.add(StockIndexGeneration(id=1, generation=0))
+            db.session.commit()
+        generation = _current_generation()
+        rows = db.session.query(
+            Inventory.product_id, Inventory.inventory_id, Inventory.stock_quantity, Inventory.restock_date
+        ).order_by(Inventory.product_id, Inventory.inventory_id).all()
+
+        product_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        # One inventory row per product; keep the first like filter_by(...).first()
+        product_ids, first = np.unique(product_ids, return_index=True)
+        inventory_ids = np.array([rows[i][1] for i in first], dtype=np.int64)
+        stock = np.array([rows[i][2] for i in first], dtype=np.int64)
+        restock_days = np.array([_epoch_day(rows[i][3]) for i in first], dtype=np.int32)
+
+        reorder_points = np.full(len(product_ids), float(LOW_STOCK_THRESHOLD))
+        points = db.session.query(ReorderPoint.product_id, ReorderPoint.reorder_point).all()
+        if points and len(product_ids):
+            ids = np.array([p[0] for p in points], dtype=np.int64)
+            idx = np.minimum(np.searchsorted(product_ids, ids), len(product_ids) - 1)
+            known = product_ids[idx] == ids
+            reorder_points[idx[known]] = np.array([p[1] for p in points], dtype=np.float64)[known]
+
+        with self._lock:
+            self._product_ids, self._inventory_ids, self._stock = product_ids, inventory_ids, stock
+            self._restock_days, self._reorder_points = restock_days, reorder_points
+            self.generation = generation
+            self._checked_at = monotonic()
+
+    def ensure_current(self):
+        """Reload when another process has written inventory since the last check"""
+        if monotonic() - self._checked_at < self.check_interval:
+            return
+        generation = _current_generation()
+        with self._lock:
+            current = generation is not None and generation == self.generation
+            self._checked_at = monotonic()
+        if not current:
+            self.load()
+
+    def _position(self, product_id):
+        i = int(np.searchsorted(self._product_ids, product_id))
+        if i < len(self._product_ids) and self._product_ids[i] == product_id:
+            return i
+        return None
+
+    def get(self, product_id):
+        """{'inventory_id', 'stock_quantity', 'reorder_point', 'restock_date'} or None"""
+        self.ensure_current()
+        with self._lock:
+            i = self._position(product_id)
+            if i is None:
+                return None
+            return {
+                'inventory_id': int(self._inventory_ids[i]),
+                'stock_quantity': int(self._stock[i]),
+                'reorder_point': float(self._reorder_points[i]),
+                'restock_date': self._date(i)
+            }
+
+    def _date(self, i):
+        day = int(self._restock_days[i])
+        return None if day == NO_DATE else np.datetime64(day, 'D').astype(object)
+
+    def items(self):
+        """Every indexed product as (product_id, inventory_id, stock, restock_date), by product_id"""
+        self.ensure_current()
+        with self._lock:
+            return [
+                (int(p), int(inv), int(s), self._date(i))
+                for i, (p, inv, s) in enumerate(zip(self._product_ids, self._inventory_ids, self._stock))
+            ]
+
+    def low_stock(self, limit=None):
+        """Products below their reorder point, lowest stock first, as (product_id, stock, reorder_point)"""
+        self.ensure_current()
+        with self._lock:
+            idx = np.flatnonzero(self._stock < self._reorder_points)
+            idx = idx[np.argsort(self._stock[idx], kind='stable')]
+            if limit is not None:
+                idx = idx[:limit]
+            return [(int(self._product_ids[i]), int(self._stock[i]), float(self._reorder_points[i])) for i in idx]
+
+    def apply(self, changes, generations):
+        """
+        Apply committed inventory writes ({product_id: (inventory_id, stock,
+        restock_date) or None when deleted}). generations is the (before, after)
+        generation of the transaction; when it does not follow on from the
+        index, another process wrote in between and the next read reloads.
+        """
+        with self._lock:
+            for product_id, values in changes.items():
+                i = self._position(product_id)
+                if values is None:
+                    if i is not None:
+                        self._delete(i)
+                    continue
+                inventory_id, stock, restock_date = values
+                if i is None:
+                    i = int(np.searchsorted(self._product_ids, product_id))
+                    self._insert(i, product_id)
+                self._inventory_ids[i] = inventory_id
+                self._stock[i] = int(stock)
+                self._restock_days[i] = _epoch_day(restock_date)
+
+            if generations is not None and self.generation is not None and generations[0] == self.generation:
+                self.generation = generations[1]
+            else:
+                self.generation = None
+                self._checked_at = 0.0
+
+    def _insert(self, i, product_id):
+        self._product_ids = np.insert(self._product_ids, i, product_id)
+        self._inventory_ids = np.insert(self._inventory_ids, i, 0)
+        self._stock = np.insert(self._stock, i, 0)
+        self._restock_days = np.insert(self._restock_days, i, NO_DATE)
+        self._reorder_points = np.insert(self._reorder_points, i, float(LOW_STOCK_THRESHOLD))
+
+    def _delete(self, i):
+        self._product_ids = np.delete(self._product_ids, i)
+        self._inventory_ids = np.delete(self._inventory_ids, i)
+        self._stock = np.delete(self._stock, i)
+        self._restock_days = np.delete(self._restock_days, i)
+        self._reorder_points = np.delete(self._reorder_points, i)
+
+
+stock_index = StockIndex()
+
+
+def _pending(session):
+    return session.info.setdefault(PENDING, {})
+
+
+@event.listens_for(Inventory, 'after_insert')
+@event.listens_for(Inventory, 'after_update')
+def _inventory_written(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _pending(session)[target.product_id] = (target.inventory_id, target.stock_quantity, target.restock_date)
+        session.info['stock_index_dirty'] = True
+
+
+@event.listens_for(Inventory, 'after_delete')
+@event.listens_for(Product, 'after_delete')
+def _inventory_deleted(mapper, connection, target):
+    # A deleted product takes its inventory rows with it (ON DELETE CASCADE)
+    session = object_session(target)
+    if session is not None:
+        _pending(session)[target.product_id] = None
+        session.info['stock_index_dirty'] = True
+
+
+def _bump_generation(session):
+    """Bump the generation in the same transaction as the inventory write"""
+    connection = session.connection()
+    connection.execute(db.text('UPDATE stock_index_generation SET generation = generation + 1 WHERE id = 1'))
+    generation = connection.execute(db.text('SELECT generation FROM stock_index_generation WHERE id = 1')).scalar()
+    if generation is None:
+        return
+    before, _ = session.info.get(GENERATION_RANGE, (generation - 1, None))
+    session.info[GENERATION_RANGE] = (before, generation)
+
+
+@event.listens_for(Session, 'after_flush')
+def _flushed(session, flush_context):
+    if session.info.pop('stock_index_dirty', False):
+        _bump_generation(session)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_write(orm_execute_state):
+    # db.insert/update/delete(Inventory), writes to reorder_points and
+    # db.delete(Product) skip the mapper events; reload on commit instead
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        name = getattr(table, 'name', None)
+        if name in (Inventory.__tablename__, ReorderPoint.__tablename__) or \
+                orm_execute_state.is_delete and name == Product.__tablename__:
+            orm_execute_state.session.info[STALE] = True
+            _bump_generation(orm_execute_state.session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _write_through(session):
+    changes = session.info.pop(PENDING, None)
+    generations = session.info.pop(GENERATION_RANGE, None)
+    if session.info.pop(STALE, False):
+        stock_index.apply(changes or {}, None)
+    elif changes:
+        stock_index.apply(changes, generations)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    for key in (PENDING, GENERATION_RANGE, STALE, 'stock_index_dirty'):
+        session.info.pop(key, None)
@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta, timezone
+from models.database import Inventory, StockMovement, StockSnapshot, db
+
+# Append-only stock movement ledger.
+#
+# Every route that changes Inventory.stock_quantity records a StockMovement in
+# the same transaction. Movements are keyed by the time they were recorded (a
+# back-dated sale changes stock when it is entered), and product_id has no
+# foreign key so history survives product deletion. Snapshots store the
+# ledger-derived stock of every product up to a movement id, so point-in-time
+# queries only scan movements recorded after the nearest earlier snapshot.
+# Times are naive UTC, so days are bounded in UTC unless a time zone is given.
+#
+# When the ledger starts, existing sales and purchases are backfilled as
+# movements stamped at midnight UTC of their dates, after an opening movement
+# per product at the earliest of those dates. Opening stock is current stock
+# minus purchases plus sales (never below zero; any difference left is
+# recorded as a reconciliation). Ledgers started before the backfill existed
+# begin at their first opening movement; see ledger_start().
+
+MAX_AS_OF_ROWS = 5000
+
+
+def record_movement(product_id, quantity_change, stock_after, reason, reference_id=None):
+    """Add a ledger entry to the current session; it commits with the stock change"""
+    movement = StockMovement(
+        product_id=product_id,
+        quantity_change=quantity_change,
+        stock_after=stock_after,
+        reason=reason,
+        reference_id=reference_id
+    )
+    db.session.add(movement)
+    return movement
+
+
+_HISTORY_EVENTS = """
+    SELECT product_id, date(sale_date) AS day, -quantity_sold AS change, 'sale' AS reason, sale_id AS reference_id
+    FROM sales
+    UNION ALL
+    SELECT product_id, date(purchase_date), quantity_purchased, 'purchase', purchase_id
+    FROM purchases
+"""
+
+
+def init_stock_ledger():
+    """Start the ledger the first time it is used: opening stock plus backfilled sales and purchases"""
+    if db.session.query(StockMovement.movement_id).first() is not None:
+        return
+    start = db.session.execute(db.text(f"SELECT MIN(day) FROM ({_HISTORY_EVENTS})")).scalar()
+    start = f'{start} 00:00:00.000000' if start else datetime.utcnow()
+
+    db.session.execute(db.text(f"""
+        INSERT INTO stock_movements (product_id, quantity_change, stock_after, reason, created_at)
+        WITH net AS (
+            SELECT product_id, SUM(change) AS change FROM ({_HISTORY_EVENTS}) GROUP BY product_id
+        ), stock AS (
+            SELECT product_id, SUM(stock_quantity) AS quantity FROM inventory GROUP BY product_id
+        ), opening AS (
+            SELECT product_id, MAX(COALESCE(stock.quantity, 0) - COALESCE(net.change, 0), 0) AS quantity
+            FROM (SELECT product_id FROM stock UNION SELECT product_id FROM net) AS products
+            LEFT JOIN stock USING (product_id)
+            LEFT JOIN net USING (product_id)
+        )
+        SELECT product_id, quantity, quantity, 'opening', :start FROM opening ORDER BY product_id
+    """), {'start': start})
+    db.session.execute(db.text(f"""
+        INSERT INTO stock_movements (product_id, quantity_change, stock_after, reason, reference_id, created_at)
+        SELECT e.product_id, e.change,
+               o.quantity_change + SUM(e.change) OVER (
+                   PARTITION BY e.product_id ORDER BY e.day, e.reason, e.reference_id ROWS UNBOUNDED PRECEDING
+               ),
+               e.reason, e.reference_id, e.day || ' 00:00:00.000000'
+        FROM ({_HISTORY_EVENTS}) AS e
+        JOIN stock_movements o ON o.product_id = e.product_id AND o.reason = 'opening'
+        ORDER BY e.day, e.reason, e.reference_id
+    """))
+    reconcile_stock(repair=True)
+    db.session.commit()
+
+
+def ledger_start():
+    """Time of the earliest movement, before which as-of queries return no stock (None for an empty ledger)"""
+    return db.session.query(db.func.min(StockMovement.created_at)).scalar()
+
+
+def end_of_day(day, zone=timezone.utc):
+    """The naive UTC instant at which calendar day `day` (a datetime at midnight) ends in zone"""
+    return (day + timedelta(days=1)).replace(tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _stock_as_of_sql(extra_filters=''):
+    return f"""
+        SELECT p.product_id, p.product_name,
+               COALESCE(s.stock_quantity, 0) + COALESCE((
+                   SELECT SUM(m.quantity_change) FROM stock_movements m
+                   WHERE m.product_id = p.product_id
+                     AND m.movement_id > COALESCE(s.last_movement_id, 0)
+                     AND m.movement_id <= :max_movement_id
+                     AND m.created_at < :as_of
+               ), 0) AS stock_quantity
+        FROM products p
+        LEFT JOIN stock_snapshots s ON s.snapshot_id = (
+            SELECT MAX(snapshot_id) FROM stock_snapshots
+            WHERE product_id = p.product_id AND taken_at < :as_of
+        )
+        WHERE (s.snapshot_id IS NOT NULL OR EXISTS (
+            SELECT 1 FROM stock_movements m
+            WHERE m.product_id = p.product_id AND m.created_at < :as_of
+        )) {extra_filters}
+        ORDER BY p.product_id
+    """
+
+
+def stock_as_of(as_of, product_id=None, after=None, limit=MAX_AS_OF_ROWS, max_movement_id=None):
+    """
+    Stock per product as recorded just before `as_of`: the nearest earlier
+    snapshot plus the movements recorded after it. Products without any ledger
+    history at that time are left out. Returns a list of dicts ordered by product_id.
+    """
+    filters = ''
+    params = {'as_of': as_of, 'max_movement_id': max_movement_id or 2 ** 62}
+    if product_id is not None:
+        filters += ' AND p.product_id = :product_id'
+        params['product_id'] = product_id
+    if after is not None:
+        filters += ' AND p.product_id > :after'
+        params['after'] = after
+    sql = _stock_as_of_sql(filters)
+    if limit is not None:
+        sql += ' LIMIT :limit'
+        params['limit'] = limit
+    return [dict(row._mapping) for row in db.session.execute(db.text(sql), params)]
+
+
+def take_stock_snapshot():
+    """Snapshot the ledger-derived stock of every product. Returns the number of rows written."""
+    now = datetime.utcnow()
+    last_movement_id = db.session.query(db.func.max(StockMovement.movement_id)).scalar()
+    if last_movement_id is None:
+        return 0
+
+    rows = [
+        {
+            'product_id': row['product_id'],
+            'stock_quantity': row['stock_quantity'],
+            'last_movement_id': last_movement_id,
+            'taken_at': now
+        }
+        for row in stock_as_of(now, limit=None, max_movement_id=last_movement_id)
+    ]
+    if rows:
+        db.session.execute(db.insert(StockSnapshot), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def reconcile_stock(repair=False):
+    """
+    Compare ledger-derived stock with Inventory.stock_quantity for every product.
+    Returns a list of mismatches; with repair=True a 'reconciliation' movement is
+    written for each so the ledger matches current stock again.
+    """
+    ledger = {row['product_id']: row['stock_quantity'] for row in stock_as_of(datetime.utcnow(), limit=None)}
+    current = dict(
+        db.session.query(Inventory.product_id, db.func.sum(Inventory.stock_quantity))
+        .group_by(Inventory.product_id).all()
+    )
+
+    mismatches = []
+    for product_id, stock in current.items():
+        ledger_stock = ledger.get(product_id, 0)
+        if ledger_stock != stock:
+            mismatches.append({'product_id': product_id, 'ledger_stock': ledger_stock, 'current_stock': stock})
+            if repair:
+                record_movement(product_id, stock - ledger_stock, stock, 'reconciliation')
+    if repair and mismatches:
+        db.session.commit()
+    return mismatches
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from flask_login import UserMixin
+from sqlalchemy import event
+from models.database import User
+
+
+class UserPrincipal(UserMixin):
+    """
+    Read-only snapshot of a User row used as Flask-Login's current_user.
+    Unlike a User instance it is not bound to a session, so it can be shared
+    between requests without being expired or detached.
+    """
+
+    def __init__(self, user):
+        self.user_id = user.user_id
+        self.username = user.username
+        self.email = user.email
+        self.join_date = user.join_date
+        self.is_admin = bool(user.is_admin)
+
+    def get_id(self):
+        return str(self.user_id)
+
+
+class UserCache:
+    """Bounded LRU cache of user principals with a time-to-live per entry"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id):
+        """Return the principal for user_id, loading it from the database on a miss"""
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        user = User.query.get(user_id)
+        if user is None:
+            self.invalidate(user_id)
+            return None
+
+        principal = UserPrincipal(user)
+        with self._lock:
+            self._entries[user_id] = (principal, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    """Drop cached principals as soon as their user row changes"""
+    user_cache.invalidate(target.user_id)
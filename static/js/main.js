@@ -77,6 +77,54 @@ function debounce(func, wait) {
     };
 }
 
+// Type-ahead product picker backed by /api/products/search.
+// Typing clears the hidden id until a suggestion is picked.
+function initProductPicker(inputId, hiddenId, onSelect) {
+    const input = document.getElementById(inputId);
+    const hidden = document.getElementById(hiddenId);
+    const menu = document.createElement('div');
+    menu.className = 'list-group product-picker-menu';
+    input.parentNode.classList.add('position-relative');
+    input.parentNode.appendChild(menu);
+    input.setAttribute('autocomplete', 'off');
+    
+    const search = debounce(function() {
+        const query = input.value.trim();
+        if (!query) {
+            menu.innerHTML = '';
+            return;
+        }
+        fetch(`/api/products/search?q=${encodeURIComponent(query)}&limit=10`)
+            .then(response => response.json())
+            .then(results => {
+                menu.innerHTML = '';
+                results.forEach(product => {
+                    const item = document.createElement('button');
+                    item.type = 'button';
+                    item.className = 'list-group-item list-group-item-action';
+                    item.textContent = `${product.product_name} (${product.category})`;
+                    item.addEventListener('mousedown', function(e) {
+                        e.preventDefault();
+                        input.value = product.product_name;
+                        hidden.value = product.product_id;
+                        menu.innerHTML = '';
+                        if (onSelect) onSelect(product);
+                    });
+                    menu.appendChild(item);
+                });
+            })
+            .catch(error => console.error('Product search failed:', error));
+    }, 200);
+    
+    input.addEventListener('input', function() {
+        hidden.value = '';
+        search();
+    });
+    input.addEventListener('blur', function() {
+        menu.innerHTML = '';
+    });
+}
+
 // Initialize tooltips (Bootstrap)
 document.addEventListener('DOMContentLoaded', function() {
     // Initialize Bootstrap tooltips if any
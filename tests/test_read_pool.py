@@ -0,0 +1,91 @@
+"""
+Routing of the read/write session between the writer and read-only pools.
+
+Run from the project root:
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+import sqlalchemy as sa
+
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test_read_pool.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models.database import db, Product
+from models.read_pool import read_only
+
+
+@pytest.fixture(autouse=True)
+def read_pool_enabled():
+    app.config['READ_POOL_ENABLED'] = True
+    yield
+    app.config['READ_POOL_ENABLED'] = True
+
+
+def read_engine():
+    return app.extensions['read_pool'].engine
+
+
+def bind_for(statement):
+    return db.session.get_bind(clause=statement)
+
+
+def test_get_reads_use_read_pool():
+    with app.test_request_context('/', method='GET'):
+        assert bind_for(sa.select(Product)) is read_engine()
+        assert bind_for(db.text('SELECT 1')) is read_engine()
+
+
+def test_get_writes_use_writer():
+    with app.test_request_context('/', method='GET'):
+        assert bind_for(sa.update(Product).values(price=1)) is db.engine
+        assert bind_for(db.text('DELETE FROM products')) is db.engine
+
+
+def test_post_reads_use_writer():
+    with app.test_request_context('/', method='POST'):
+        assert bind_for(sa.select(Product)) is db.engine
+
+
+def test_read_only_block_uses_read_pool():
+    with app.app_context():
+        assert bind_for(sa.select(Product)) is db.engine
+        with read_only():
+            assert bind_for(sa.select(Product)) is read_engine()
+        assert bind_for(sa.select(Product)) is db.engine
+
+
+def test_disabled_read_pool_uses_writer():
+    app.config['READ_POOL_ENABLED'] = False
+    with app.test_request_context('/', method='GET'):
+        assert bind_for(sa.select(Product)) is db.engine
+
+
+def test_read_pool_rejects_writes():
+    with read_engine().connect() as conn:
+        with pytest.raises(sa.exc.OperationalError, match='readonly'):
+            conn.execute(db.text("INSERT INTO products (product_name, category, price) VALUES ('x', 'x', 1)"))
+
+
+def test_get_reads_own_flushed_rows():
+    with app.test_request_context('/', method='GET'):
+        db.session.add(Product(product_name='Read your writes', category='Test', price=1))
+        db.session.flush()
+        assert bind_for(sa.select(Product)) is db.engine
+        assert Product.query.filter_by(product_name='Read your writes').first() is not None
+        db.session.rollback()
+        assert bind_for(sa.select(Product)) is read_engine()
+        assert Product.query.filter_by(product_name='Read your writes').first() is None
+
+
+def test_get_reads_own_dml():
+    with app.test_request_context('/', method='GET'):
+        db.session.execute(sa.insert(Product).values(product_name='Bulk insert', category='Test', price=1))
+        assert db.session.scalar(sa.select(sa.func.count()).where(Product.product_name == 'Bulk insert')) == 1
+        db.session.commit()
+        assert bind_for(sa.select(Product)) is read_engine()
+        assert db.session.scalar(sa.select(sa.func.count()).where(Product.product_name == 'Bulk insert')) == 1